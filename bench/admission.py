@@ -0,0 +1,156 @@
+"""Tail latency of interactive chat while bulk generation saturates the model.
+
+Runs the API against a slow fake Gemini that, like a quota, answers 429 once
+more than --llm-capacity calls are in flight. Bulk clients from a few users
+hammer /exercise/generate while chat clients (one user each) talk to
+/mentor/chat, first with the LLM scheduler disabled and then with it sized to
+the capacity. Reports latency of successful requests, shed (429) and failed
+("Sorry...") answers per class, and the scheduler's queue-wait stats; exits
+with status 1 if scheduled chat p99 exceeds --chat-p99-limit-ms.
+
+    python -m bench.admission --llm-latency-ms 500 --llm-capacity 4 --duration 20
+    python -m bench.admission --modes scheduled --bulk-clients 120 --bulk-users 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench import fake_gemini
+from bench.run import _free_port, start_app, summarize
+from bench.samples import TOPICS
+
+
+async def client_loop(client, stop_at, make_request, results, think_time, backoff):
+    i = 0
+    while time.monotonic() < stop_at:
+        url, payload = make_request(i)
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = await client.post(url, json=payload)
+            status = response.status_code
+            failed = status == 200 and "Sorry" in response.text
+        except httpx.HTTPError:
+            status, failed = "error", True
+        elapsed = time.perf_counter() - start
+        if status == 200 and not failed:
+            results["latencies"].append(elapsed)
+            results["ok"] += 1
+        elif status == 429:
+            results["shed"] += 1
+            await asyncio.sleep(backoff)
+        else:
+            results["failed"] += 1
+        await asyncio.sleep(think_time)
+
+
+def _new_results():
+    return {"ok": 0, "shed": 0, "failed": 0, "latencies": []}
+
+
+async def drive(port, args):
+    chat, bulk = _new_results(), _new_results()
+    stop_at = time.monotonic() + args.duration
+    clients = args.chat_clients + args.bulk_clients
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120, limits=limits) as client:
+        tasks = []
+        for c in range(args.chat_clients):
+            make = lambda i, c=c: ("/api/mentor/chat", {
+                "userId": f"student-{c}", "message": f"Can you explain {TOPICS[i % len(TOPICS)]}?",
+            })
+            tasks.append(client_loop(client, stop_at, make, chat, args.chat_think_s, args.backoff_s))
+        for c in range(args.bulk_clients):
+            make = lambda i, c=c: ("/api/exercise/generate", {
+                "userId": f"teacher-{c % args.bulk_users}", "topic": TOPICS[i % len(TOPICS)],
+                "exercise_type": "mcq", "num_questions": 5,
+            })
+            tasks.append(client_loop(client, stop_at, make, bulk, 0, args.backoff_s))
+        await asyncio.gather(*tasks)
+        queue = None
+        try:
+            queue = (await client.get("/api/llm/queue")).json()
+        except (httpx.HTTPError, ValueError):
+            pass
+
+    def report(results):
+        return {
+            "ok": results["ok"],
+            "shed_429": results["shed"],
+            "failed": results["failed"],
+            "latency_ms": summarize(results["latencies"]),
+        }
+    return {"chat": report(chat), "bulk": report(bulk), "scheduler": queue}
+
+
+def run_mode(args, scheduled):
+    gemini = fake_gemini.start(
+        latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms, max_concurrent=args.llm_capacity
+    )
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.llm_capacity if scheduled else 0)
+    os.environ["LLM_MAX_QUEUE"] = str(args.max_queue)
+    os.environ["LLM_MAX_QUEUE_PER_USER"] = str(args.max_queue_per_user)
+    os.environ["LLM_QUEUE_TIMEOUT_SECONDS"] = str(args.queue_timeout)
+    port = _free_port()
+    data_dir = tempfile.mkdtemp(prefix="bench-")
+    proc = start_app(port, gemini.url, data_dir, args)
+    try:
+        result = asyncio.run(drive(port, args))
+        result["llm_calls"] = gemini.calls
+        result["llm_quota_errors"] = gemini.quota_errors
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        gemini.shutdown()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    print(
+        f"{'scheduled' if scheduled else 'unscheduled':>11}: chat ok={result['chat']['ok']} "
+        f"p99={result['chat']['latency_ms']['p99']}ms failed={result['chat']['failed']} | "
+        f"bulk ok={result['bulk']['ok']} shed={result['bulk']['shed_429']} failed={result['bulk']['failed']}",
+        file=sys.stderr,
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLM admission control under overload")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds per mode")
+    parser.add_argument("--chat-clients", type=int, default=4)
+    parser.add_argument("--chat-think-s", type=float, default=0.5)
+    # More clients than anyio's default 40 threads, so the pool sizing is exercised
+    parser.add_argument("--bulk-clients", type=int, default=60)
+    parser.add_argument("--bulk-users", type=int, default=15)
+    parser.add_argument("--backoff-s", type=float, default=0.5, help="Client pause after a 429")
+    parser.add_argument("--llm-latency-ms", type=float, default=500)
+    parser.add_argument("--llm-jitter-ms", type=float, default=100)
+    parser.add_argument("--llm-capacity", type=int, default=4, help="Concurrent calls the fake model accepts")
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--max-queue-per-user", type=int, default=4)
+    parser.add_argument("--queue-timeout", type=float, default=5, help="Longest queue wait before shedding")
+    parser.add_argument("--chat-p99-limit-ms", type=float, default=3000)
+    parser.add_argument("--modes", default="unscheduled,scheduled")
+    parser.add_argument("--supabase-latency-ms", type=float, default=5)
+    parser.add_argument("--embedder", default="hash")
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--verbose", action="store_true", help="Show the app's logs")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in [m for m in args.modes.split(",") if m]:
+        results[mode] = run_mode(args, scheduled=mode == "scheduled")
+    config = {k: v for k, v in vars(args).items() if k != "verbose"}
+    print(json.dumps({"config": config, "modes": results}, indent=2))
+    chat_p99 = results.get("scheduled", {}).get("chat", {}).get("latency_ms", {}).get("p99")
+    if chat_p99 is not None and chat_p99 > args.chat_p99_limit_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""The API wired to in-memory fakes, for benchmarking without network access.
+
+Mirrors server.py's routers (without the static test UI) with Supabase
+replaced by bench.fake_supabase and, by default, the MiniLM encoder replaced
+by a hashing encoder so no model download is needed. Gemini is redirected by
+setting GEMINI_API_ENDPOINT before starting.
+
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8765 python -m bench.app --port 8001
+"""
+import argparse
+import os
+
+from fastapi import FastAPI
+
+from bench.fake_supabase import FakeSupabase, install
+
+
+def create_app(supabase_latency_ms=0, embedder="hash"):
+    os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("SUPABASE_ANON_KEY", "bench.fake.key")
+    os.environ.setdefault("GEMINI_API_KEY", "bench-fake-key")
+
+    from utils.embeddings import register_embedding_backend
+    from bench.fake_embedder import HashingEncoder
+    register_embedding_backend("hash", HashingEncoder)
+    os.environ["EMBEDDING_BACKEND"] = embedder
+
+    from routes.exercises import router as exercise_router
+    from routes.mentor import router as mentor_router
+    from routes.llm import router as llm_router
+
+    fake = install(FakeSupabase(latency_ms=supabase_latency_ms))
+
+    app = FastAPI()
+    app.include_router(mentor_router, prefix="/api")
+    app.include_router(exercise_router, prefix="/api")
+    app.include_router(llm_router, prefix="/api")
+
+    @app.on_event("startup")
+    async def size_threadpool():
+        from utils.llm import reserve_scheduler_threads
+        reserve_scheduler_threads()
+
+    @app.get("/")
+    async def read_root():
+        return {"message": "Exercise Generator API is running"}
+
+    @app.get("/__bench/tables")
+    async def table_counts():
+        return fake.row_counts()
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API against in-memory fakes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--supabase-latency-ms", type=float, default=0)
+    parser.add_argument("--embedder", choices=["hash", "torch", "onnx", "onnx-int8"], default="hash")
+    args = parser.parse_args()
+
+    import uvicorn
+    app = create_app(args.supabase_latency_ms, args.embedder)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Compare two bench.run reports.
+
+    python -m bench.compare before.json after.json
+"""
+import argparse
+import json
+
+
+def _pct(old, new):
+    if old in (None, 0) or new is None:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(before, after):
+    rows = []
+    for scenario, runs in after["scenarios"].items():
+        old_runs = {r["concurrency"]: r for r in before["scenarios"].get(scenario, [])}
+        for run in runs:
+            old = old_runs.get(run["concurrency"])
+            if not old:
+                continue
+            rows.append((scenario, run["concurrency"], "rps", old["throughput_rps"], run["throughput_rps"]))
+            for q in ("p50", "p95", "p99"):
+                rows.append((scenario, run["concurrency"], q, old["latency_ms"][q], run["latency_ms"][q]))
+            rows.append((scenario, run["concurrency"], "peak rss", old["rss_mb"]["peak"], run["rss_mb"]["peak"]))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark reports")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(f"{before.get('commit')} -> {after.get('commit')}")
+    print(f"{'scenario':>10} {'c':>4} {'metric':>9} {'before':>10} {'after':>10} {'change':>8}")
+    for scenario, concurrency, metric, old, new in compare(before, after):
+        print(f"{scenario:>10} {concurrency:>4} {metric:>9} {str(old):>10} {str(new):>10} {_pct(old, new):>8}")
+
+
+if __name__ == "__main__":
+    main()
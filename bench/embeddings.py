@@ -0,0 +1,127 @@
+"""Throughput, query latency and parity of the embedding backends.
+
+Encodes RAG-sized chunks (ingestion) and single short queries (retrieval)
+with plain SentenceTransformer.encode, the way RAGProcessor used to, and
+with each utils.embeddings backend. Parity is the cosine similarity of each
+backend's embeddings to the SentenceTransformer ones, plus recall@k of
+query-to-chunk retrieval against the SentenceTransformer ranking (cosine
+alone says little for models whose embeddings are all close together). The
+script exits with status 1 if any backend falls below --min-cosine or
+--min-recall.
+
+    python -m bench.embeddings --backends torch,onnx,onnx-int8 --chunks 512
+    python -m bench.embeddings --model path/to/all-MiniLM-L6-v2   # a local copy
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from bench.samples import TOPICS, sample_text
+from utils.embeddings import DEFAULT_MODEL, create_embedding_backend
+
+
+def _chunks(count):
+    words = " ".join(sample_text(count + 1)).split()
+    chunks = [" ".join(words[i:i + 300]) for i in range(0, len(words), 250)]
+    # Mix in short chunks, as the tail of a chapter or a short page produces
+    return [c if i % 4 else " ".join(c.split()[:40]) for i, c in enumerate(chunks[:count])]
+
+
+def _queries(count):
+    return [f"What does the book say about {TOPICS[i % len(TOPICS)]} and example {i}?" for i in range(count)]
+
+
+def _latency(encode, queries):
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        encode([q])
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        "p50_ms": round(times[len(times) // 2] * 1000, 2),
+        "p95_ms": round(times[int(len(times) * 0.95)] * 1000, 2),
+    }
+
+
+def _top_k(queries, chunks, k):
+    return np.argsort(-(queries @ chunks.T), axis=1)[:, :k]
+
+
+def _measure(encode, chunks, queries, reference, load_s, k):
+    encode(chunks[:8])  # warm up
+    start = time.perf_counter()
+    vectors = np.asarray(encode(chunks), dtype=np.float32)
+    ingest = time.perf_counter() - start
+    result = {
+        "load_s": round(load_s, 2),
+        "sentences_per_s": round(len(chunks) / ingest, 1),
+        "query_latency": _latency(encode, queries),
+    }
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    query_vectors = np.asarray(encode(queries), dtype=np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    if reference is not None:
+        ref_vectors, ref_queries = reference
+        cosine = (vectors * ref_vectors).sum(axis=1)
+        result["parity_cosine"] = {"min": round(float(cosine.min()), 5), "mean": round(float(cosine.mean()), 5)}
+        ours, theirs = _top_k(query_vectors, vectors, k), _top_k(ref_queries, ref_vectors, k)
+        overlap = [len(set(a) & set(b)) / k for a, b in zip(ours, theirs)]
+        result[f"recall_at_{k}"] = round(float(np.mean(overlap)), 4)
+    return result, (vectors, query_vectors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends")
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--chunks", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--max-seq-length", type=int, default=256)
+    parser.add_argument("--batch-tokens", type=int, default=16384)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+    chunks, queries = _chunks(args.chunks), _queries(args.queries)
+
+    start = time.perf_counter()
+    model = SentenceTransformer(args.model, device="cpu")
+    model.max_seq_length = args.max_seq_length
+    load_s = time.perf_counter() - start
+    baseline, reference = _measure(
+        lambda s: model.encode(s, show_progress_bar=False, normalize_embeddings=True),
+        chunks, queries, None, load_s, args.k
+    )
+    results = {"sentence-transformers": baseline}
+
+    failed = []
+    for name in [b for b in args.backends.split(",") if b]:
+        start = time.perf_counter()
+        backend = create_embedding_backend(name, args.model, args.max_seq_length, args.batch_tokens)
+        load_s = time.perf_counter() - start
+        results[name], _ = _measure(backend.encode, chunks, queries, reference, load_s, args.k)
+        if (results[name]["parity_cosine"]["min"] < args.min_cosine
+                or results[name][f"recall_at_{args.k}"] < args.min_recall):
+            failed.append(name)
+
+    print(json.dumps({
+        "model": args.model,
+        "chunks": len(chunks),
+        "queries": len(queries),
+        "max_seq_length": args.max_seq_length,
+        "batch_tokens": args.batch_tokens,
+        "results": results,
+        "parity_failed": failed,
+    }, indent=2))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
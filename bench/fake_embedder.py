@@ -0,0 +1,28 @@
+"""Offline stand-in for SentenceTransformer that hashes tokens into a fixed-size vector"""
+import hashlib
+import re
+
+import numpy as np
+
+
+class HashingEncoder:
+    def __init__(self, model_name=None, dimension=384, **kwargs):
+        self.dimension = dimension
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def _vector(self, text):
+        vec = np.zeros(self.dimension, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            h = int.from_bytes(digest, "little")
+            vec[h % self.dimension] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def encode(self, sentences, show_progress_bar=False, **kwargs):
+        single = isinstance(sentences, str)
+        batch = [sentences] if single else list(sentences)
+        vectors = np.vstack([self._vector(s) for s in batch]) if batch else np.zeros((0, self.dimension), np.float32)
+        return vectors[0] if single else vectors
@@ -0,0 +1,220 @@
+"""Local fake of the Gemini REST API.
+
+Answers `POST /v1beta/models/<model>:generateContent` with canned text picked
+from the prompt (exercise type and question count), after a configurable
+latency. Point the app at it with GEMINI_API_ENDPOINT=http://127.0.0.1:<port>.
+
+    python -m bench.fake_gemini --port 8765 --latency-ms 400 --jitter-ms 100
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _mcq(n):
+    lines = []
+    for i in range(1, n + 1):
+        lines.append(f"{i}. Which statement about concept {i} is correct?")
+        for label in "abcd":
+            lines.append(f"{label}) Option {label.upper()} for concept {i}")
+    lines.append("Answer Key:")
+    lines.extend(f"{i}. {'abcd'[i % 4]}" for i in range(1, n + 1))
+    return "\n".join(lines)
+
+
+def _true_false(n):
+    lines = [f"{i}. True or False: Statement number {i} holds for this topic." for i in range(1, n + 1)]
+    lines.append("Answer Key:")
+    lines.extend(f"{i}. {'True' if i % 2 else 'False'}" for i in range(1, n + 1))
+    return "\n".join(lines)
+
+
+def _blanks(n):
+    lines = [f"{i}. The ______ is the key term in sentence {i}." for i in range(1, n + 1)]
+    lines.append("Answer Key:")
+    lines.extend(f"term{i}" for i in range(1, n + 1))
+    return "\n".join(lines)
+
+
+def _questions(kind):
+    def build(n):
+        return "\n".join(f"{i}. {kind} question {i}: explain the idea in your own words." for i in range(1, n + 1))
+    return build
+
+
+def _flashcards(n):
+    cards = [{"question": f"Term {i}?", "hint": f"Hint {i}", "answer": f"Answer {i}"} for i in range(1, n + 1)]
+    return json.dumps({"Flashcards": cards})
+
+
+def _match_columns(n):
+    a = [f"Item {i}" for i in range(1, n + 1)]
+    b = [f"Meaning {i}" for i in range(1, n + 1)]
+    return json.dumps({"Match the Columns": [{"columnA": a, "columnB": b, "answers": dict(zip(a, b))}]})
+
+
+# Exercise type aliases as accepted by routes/exercises.py
+CANNED_OUTPUTS = {
+    ("multiple choice", "mcq", "mcqs"): _mcq,
+    ("true/false", "true_false", "true false", "tf"): _true_false,
+    ("fill in the blanks", "fill_blanks", "fill blank", "blanks"): _blanks,
+    ("short answer", "short_questions", "short question", "sqs"): _questions("Short"),
+    ("long questions", "long_questions", "long question", "lqs"): _questions("Long"),
+    ("flashcards", "flashcard"): _flashcards,
+    ("match the columns", "match_columns", "match the column", "match columns"): _match_columns,
+}
+
+DEFAULT_ANSWER = (
+    "Here is a short explanation based on the material. The key idea is that each "
+    "concept builds on the previous one, so review the earlier sections first."
+)
+
+
+def canned_response(prompt, overrides=None):
+    """Return the canned model output for a prompt"""
+    overrides = overrides or {}
+    # The system instruction may quote the prompt template, so use the last concrete match
+    kind, n = None, 5
+    with_context = re.findall(r"Exercise Type:\s*([^\n{}]+)\n", prompt)
+    without_context = re.findall(r"create (\d+) ([^\n{}]+?) questions about", prompt, re.IGNORECASE)
+    if with_context:
+        kind = with_context[-1]
+        count = re.findall(r"Number of Questions:\s*(\d+)", prompt)
+        n = int(count[-1]) if count else n
+    elif without_context:
+        n, kind = int(without_context[-1][0]), without_context[-1][1]
+    if kind:
+        kind = kind.strip().lower()
+        if kind in overrides:
+            return overrides[kind]
+        for aliases, build in CANNED_OUTPUTS.items():
+            if kind in aliases:
+                return build(n)
+    return overrides.get("default", DEFAULT_ANSWER)
+
+
+def _prompt_text(body):
+    parts = []
+    for content in body.get("contents", []):
+        for part in content.get("parts", []):
+            parts.append(part.get("text", ""))
+    return "\n".join(parts)
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=0, jitter_ms=0, overrides=None, seed=0, max_concurrent=0):
+        super().__init__(address, FakeGeminiHandler)
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.overrides = overrides or {}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = []  # estimated size of every generateContent prompt, in call order
+        self.max_concurrent = max_concurrent  # like a quota: calls beyond it get 429 (0 = unlimited)
+        self.in_flight = 0
+        self.quota_errors = 0
+
+    def delay(self):
+        with self.lock:
+            self.calls += 1
+            jitter = self.random.uniform(-self.jitter, self.jitter) if self.jitter else 0
+        return max(0.0, self.latency + jitter)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self._send(400, {"error": {"code": 400, "message": "Invalid JSON"}})
+        prompt = _prompt_text(body)
+        path = self.path.split("?")[0]
+        if path.endswith(":countTokens"):
+            return self._send(200, {"totalTokens": max(1, len(prompt) // 4)})
+        if not path.endswith(":generateContent"):
+            return self._send(404, {"error": {"code": 404, "message": f"Unknown path {path}"}})
+        server = self.server
+        with server.lock:
+            server.prompt_tokens.append(max(1, len(prompt) // 4))
+            if server.max_concurrent and server.in_flight >= server.max_concurrent:
+                server.quota_errors += 1
+                return self._send(429, {"error": {
+                    "code": 429, "message": "Resource has been exhausted (e.g. check quota).",
+                    "status": "RESOURCE_EXHAUSTED",
+                }})
+            server.in_flight += 1
+        try:
+            time.sleep(server.delay())
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+        text = canned_response(prompt, server.overrides)
+        self._send(200, {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {
+                "promptTokenCount": max(1, len(prompt) // 4),
+                "candidatesTokenCount": max(1, len(text) // 4),
+                "totalTokenCount": max(1, (len(prompt) + len(text)) // 4),
+            },
+        })
+
+
+def start(host="127.0.0.1", port=0, latency_ms=0, jitter_ms=0, overrides=None, max_concurrent=0):
+    """Start the fake server in a daemon thread and return it"""
+    server = FakeGeminiServer((host, port), latency_ms, jitter_ms, overrides, max_concurrent=max_concurrent)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Gemini API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--max-concurrent", type=int, default=0, help="Answer 429 beyond this many calls at once")
+    parser.add_argument("--outputs", help="JSON file mapping exercise type (or 'default') to response text")
+    args = parser.parse_args()
+    overrides = None
+    if args.outputs:
+        with open(args.outputs) as f:
+            overrides = {k.lower(): v for k, v in json.load(f).items()}
+    server = FakeGeminiServer(
+        (args.host, args.port), args.latency_ms, args.jitter_ms, overrides, max_concurrent=args.max_concurrent
+    )
+    print(f"Fake Gemini listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""In-memory stand-in for the parts of the Supabase table API the app uses.
+
+Supports `table(name)` with select/insert/upsert/update/delete, the common
+filters (eq, neq, gt, gte, lt, lte, in_), order, limit and range. Every
+`execute()` can sleep for a fixed latency to model the network round trip.
+"""
+import copy
+import itertools
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.action = "select"
+        self.payload = None
+        self.on_conflict = None
+        self.filters = []
+        self.orders = []
+        self.limit_n = None
+        self.offset = 0
+
+    # Actions
+    def select(self, *columns, count=None):
+        self.action = "select"
+        return self
+
+    def insert(self, rows, **kwargs):
+        self.action = "insert"
+        self.payload = rows
+        return self
+
+    def upsert(self, rows, on_conflict="id", **kwargs):
+        self.action = "upsert"
+        self.payload = rows
+        self.on_conflict = on_conflict
+        return self
+
+    def update(self, values, **kwargs):
+        self.action = "update"
+        self.payload = values
+        return self
+
+    def delete(self, **kwargs):
+        self.action = "delete"
+        return self
+
+    # Filters
+    def _filter(self, column, test):
+        self.filters.append((column, test))
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, lambda v: v == value)
+
+    def neq(self, column, value):
+        return self._filter(column, lambda v: v != value)
+
+    def gt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v > value)
+
+    def gte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v >= value)
+
+    def lt(self, column, value):
+        return self._filter(column, lambda v: v is not None and v < value)
+
+    def lte(self, column, value):
+        return self._filter(column, lambda v: v is not None and v <= value)
+
+    def in_(self, column, values):
+        values = list(values)
+        return self._filter(column, lambda v: v in values)
+
+    # Modifiers
+    def order(self, column, desc=False, **kwargs):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n, **kwargs):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.offset = start
+        self.limit_n = end - start + 1
+        return self
+
+    def _matches(self, row):
+        return all(test(row.get(column)) for column, test in self.filters)
+
+    def execute(self):
+        if self.db.latency:
+            time.sleep(self.db.latency)
+        with self.db.lock:
+            rows = self.db.tables.setdefault(self.table, [])
+            if self.action in ("insert", "upsert"):
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                written = []
+                for row in payload:
+                    row = self.db.with_defaults(self.table, row)
+                    if self.action == "upsert":
+                        keys = self.on_conflict.split(",")
+                        existing = next(
+                            (r for r in rows if all(r.get(k) == row.get(k) for k in keys)), None
+                        )
+                        if existing is not None:
+                            existing.update(row)
+                            written.append(copy.deepcopy(existing))
+                            continue
+                    rows.append(row)
+                    written.append(copy.deepcopy(row))
+                return FakeResponse(written, len(written))
+            matched = [r for r in rows if self._matches(r)]
+            if self.action == "update":
+                for r in matched:
+                    r.update(self.payload)
+                return FakeResponse(copy.deepcopy(matched), len(matched))
+            if self.action == "delete":
+                self.db.tables[self.table] = [r for r in rows if not self._matches(r)]
+                return FakeResponse(copy.deepcopy(matched), len(matched))
+            for column, desc in reversed(self.orders):
+                matched.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+            end = None if self.limit_n is None else self.offset + self.limit_n
+            result = copy.deepcopy(matched[self.offset:end])
+            return FakeResponse(result, len(matched))
+
+
+class FakeSupabase:
+    """Thread-safe in-memory database with Supabase-style `id` and `created_at` defaults"""
+
+    def __init__(self, latency_ms=0):
+        self.latency = latency_ms / 1000.0
+        self.tables = {}
+        self.lock = threading.Lock()
+        self._ids = {}
+
+    def with_defaults(self, table, row):
+        row = copy.deepcopy(row)
+        counter = self._ids.setdefault(table, itertools.count(1))
+        if row.get("id") is None:
+            row["id"] = next(counter)
+        if row.get("created_at") is None:
+            row["created_at"] = datetime.utcnow().isoformat()
+        return row
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def row_counts(self):
+        with self.lock:
+            return {name: len(rows) for name, rows in self.tables.items()}
+
+
+def install(fake):
+    """Swap the app's Supabase client for `fake` in every module that imported it"""
+    import controller
+
+    original = controller.supabase
+    for name, module in list(sys.modules.items()):
+        if not name.split(".")[0] in ("controller", "routes", "utils", "model", "server"):
+            continue
+        if getattr(module, "supabase", None) is original:
+            module.supabase = fake
+    return fake
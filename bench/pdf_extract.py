@@ -0,0 +1,62 @@
+"""Speedup of sharded PDF text extraction against page count.
+
+Times utils.pdf_extract.extract_pdf_text on generated sample books with one
+process (the original page-by-page walk) and with process pools of several
+sizes, checking that every run returns the same text.
+
+    python -m bench.pdf_extract --pages 64 --pages 512 --workers 2 --workers 4
+"""
+import argparse
+import json
+import os
+import time
+
+from bench.samples import sample_pdf
+from utils.pdf_extract import extract_pdf_text
+
+
+def _best_of(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel PDF extraction")
+    parser.add_argument("--pages", type=int, action="append", help="Pages per sample book (repeatable)")
+    parser.add_argument("--workers", type=int, action="append", help="Pool sizes to try (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    page_counts = args.pages or [16, 64, 256, 1024]
+    pool_sizes = args.workers or sorted({2, 4, os.cpu_count() or 1})
+
+    # Start each pool once so process spawn time is reported separately
+    pool_startup = {}
+    warmup = sample_pdf(8)
+    for workers in pool_sizes:
+        start = time.perf_counter()
+        extract_pdf_text(warmup, workers=workers, min_pages=0)
+        pool_startup[workers] = round(time.perf_counter() - start, 3)
+
+    results = []
+    for pages in page_counts:
+        data = sample_pdf(pages)
+        serial, expected = _best_of(lambda: extract_pdf_text(data, workers=1), args.repeat)
+        row = {"pages": pages, "pdf_bytes": len(data), "serial_s": round(serial, 4), "parallel": {}}
+        for workers in pool_sizes:
+            elapsed, text = _best_of(lambda: extract_pdf_text(data, workers=workers, min_pages=0), args.repeat)
+            row["parallel"][workers] = {
+                "seconds": round(elapsed, 4),
+                "speedup": round(serial / elapsed, 2),
+                "identical": text == expected,
+            }
+        results.append(row)
+    print(json.dumps({"cpus": os.cpu_count(), "pool_startup_s": pool_startup, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+"""Load test for the API with a fake Gemini server and in-memory Supabase.
+
+Starts bench.fake_gemini in this process and bench.app in a subprocess, then
+drives each endpoint at the requested concurrency levels and prints a JSON
+report (throughput, latency percentiles and server RSS) that can be diffed
+across commits with bench.compare.
+
+    python -m bench.run --requests 50 --concurrency 1,8 --output before.json
+    python -m bench.run --scenarios generate,mentor --llm-latency-ms 800
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from bench import fake_gemini
+from bench.samples import TOPICS, sample_pdf
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXERCISE_TYPES = ["mcq", "true_false", "fill_blanks", "short_questions", "long_questions"]
+
+SAVE_PAYLOADS = {
+    "mcq": [{"question": "Which is correct?", "options": ["A", "B", "C", "D"], "correct": "B"}],
+    "true_false": [{"question": "The sky is blue.", "answer": "True"}],
+    "fill_blanks": [{"question": "The ____ rises in the east.", "answer": "sun"}],
+    "short_questions": [{"question": "Define energy."}],
+    "long_questions": [{"question": "Explain the water cycle."}],
+    "match_columns": [{"columnA": ["a", "b"], "columnB": ["1", "2"], "answers": {"a": "1", "b": "2"}}],
+    "flashcards": [{"question": "H2O?", "hint": "Drink it", "answer": "Water"}],
+}
+
+SCENARIOS = ["upload", "generate", "ask", "save", "mentor"]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _proc_status(pid):
+    """Return (VmRSS, VmHWM) in MiB for a Linux process"""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in ("VmRSS", "VmHWM"):
+                    values[key] = int(rest.split()[0]) / 1024.0
+    except OSError:
+        pass
+    return values.get("VmRSS"), values.get("VmHWM")
+
+
+class RSSSampler:
+    """Samples a process's RSS in a background thread"""
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start_rss = _proc_status(self.pid)[0]
+        self.peak = self.start_rss or 0.0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = _proc_status(self.pid)[0]
+            if rss:
+                self.peak = max(self.peak, rss)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.end_rss = _proc_status(self.pid)[0]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies):
+    values = sorted(latencies)
+    ms = lambda v: None if v is None else round(v * 1000, 2)
+    return {
+        "mean": ms(sum(values) / len(values)) if values else None,
+        "p50": ms(percentile(values, 50)),
+        "p90": ms(percentile(values, 90)),
+        "p95": ms(percentile(values, 95)),
+        "p99": ms(percentile(values, 99)),
+        "max": ms(values[-1]) if values else None,
+    }
+
+
+class Workload:
+    """Builds the request for the i-th call of a scenario"""
+
+    def __init__(self, users, num_questions, pdf_bytes, use_bank=False):
+        self.users = users
+        self.num_questions = num_questions
+        self.pdf_bytes = pdf_bytes
+        self.use_bank = use_bank
+
+    def user(self, i):
+        return f"bench-user-{i % self.users}"
+
+    def request(self, scenario, i):
+        topic = TOPICS[i % len(TOPICS)]
+        if scenario == "upload":
+            return "POST", "/api/exercise/upload-book", {
+                "data": {"userId": self.user(i)},
+                "files": {"file": ("book.pdf", self.pdf_bytes, "application/pdf")},
+            }
+        if scenario == "generate":
+            return "POST", "/api/exercise/generate", {"json": {
+                "userId": self.user(i),
+                "topic": topic,
+                "exercise_type": EXERCISE_TYPES[i % len(EXERCISE_TYPES)],
+                "difficulty_level": "medium",
+                "num_questions": self.num_questions,
+                "grade": "8",
+                "subject": "science",
+                "use_bank": self.use_bank,
+            }}
+        if scenario == "ask":
+            return "POST", "/api/exercise/ask", {"json": {
+                "userId": self.user(i), "question": f"What is the main idea of {topic}?",
+            }}
+        if scenario == "save":
+            kinds = list(SAVE_PAYLOADS)
+            kind = kinds[i % len(kinds)]
+            return "POST", "/api/exercise/save", {"json": {
+                "exerciseType": kind,
+                "exerciseData": SAVE_PAYLOADS[kind] * self.num_questions,
+                "grade": "8", "subject": "science", "topic": topic, "sub_topic": "overview",
+            }}
+        if scenario == "mentor":
+            return "POST", "/api/mentor/chat", {"json": {
+                "userId": self.user(i), "message": f"Can you help me understand {topic}?",
+            }}
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def run_scenario(client, workload, scenario, total, concurrency, warmup):
+    for i in range(warmup):
+        method, url, kwargs = workload.request(scenario, i)
+        await client.request(method, url, **kwargs)
+
+    latencies, statuses = [], {}
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            method, url, kwargs = workload.request(scenario, i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    ok = statuses.get("200", 0)
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+        "ok": ok,
+        "errors": total - ok,
+        "status_counts": statuses,
+        "latency_ms": summarize(latencies),
+    }
+
+
+def start_app(port, gemini_url, data_dir, args):
+    env = dict(os.environ)
+    env.update({
+        "GEMINI_API_ENDPOINT": gemini_url,
+        "GEMINI_API_KEY": "bench-fake-key",
+        "RAG_STORAGE_DIR": os.path.join(data_dir, "rag_store"),
+        "BATCH_JOB_DIR": os.path.join(data_dir, "batch_jobs"),
+        "PYTHONPATH": ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+    })
+    cmd = [
+        sys.executable, "-m", "bench.app", "--port", str(port),
+        "--supabase-latency-ms", str(args.supabase_latency_ms), "--embedder", args.embedder,
+    ]
+    log = None if args.verbose else subprocess.DEVNULL
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=log)
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"bench.app exited with code {proc.returncode}; rerun with --verbose")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("bench.app did not start in time")
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def drive(args, port, pid, workload, gemini):
+    results = {}
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout, limits=limits) as client:
+        for scenario in args.scenarios:
+            results[scenario] = []
+            for concurrency in args.concurrency:
+                first_call = len(gemini.prompt_tokens)
+                with RSSSampler(pid) as rss:
+                    result = await run_scenario(client, workload, scenario, args.requests, concurrency, args.warmup)
+                prompts = sorted(gemini.prompt_tokens[first_call:])
+                result["llm_prompt_tokens"] = {
+                    "p50": percentile(prompts, 50),
+                    "max": prompts[-1] if prompts else None,
+                }
+                result["rss_mb"] = {
+                    "start": rss.start_rss and round(rss.start_rss, 1),
+                    "peak": round(rss.peak, 1),
+                    "end": rss.end_rss and round(rss.end_rss, 1),
+                }
+                results[scenario].append(result)
+                print(
+                    f"{scenario:>8} c={concurrency:<3} {result['throughput_rps']} req/s "
+                    f"p50={result['latency_ms']['p50']}ms p99={result['latency_ms']['p99']}ms "
+                    f"errors={result['errors']}",
+                    file=sys.stderr,
+                )
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the API against local fakes")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per scenario and concurrency level")
+    parser.add_argument("--concurrency", default="1,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--users", type=int, default=4, help="Distinct userIds to spread requests over")
+    parser.add_argument("--num-questions", type=int, default=5)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--use-bank", action="store_true", help="Serve saved exercises before generating")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50)
+    parser.add_argument("--llm-outputs", help="JSON file overriding the fake Gemini's canned outputs")
+    parser.add_argument("--supabase-latency-ms", type=float, default=5)
+    parser.add_argument("--embedder", choices=["hash", "torch", "onnx", "onnx-int8"], default="hash",
+                        help="Embedding backend; hash needs no model download")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's logs")
+    args = parser.parse_args(argv)
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+    args.concurrency = [int(c) for c in args.concurrency.split(",") if c]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    overrides = None
+    if args.llm_outputs:
+        with open(args.llm_outputs) as f:
+            overrides = {k.lower(): v for k, v in json.load(f).items()}
+    gemini = fake_gemini.start(latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms, overrides=overrides)
+    port = _free_port()
+    data_dir = tempfile.mkdtemp(prefix="bench-")
+    proc = start_app(port, gemini.url, data_dir, args)
+    try:
+        workload = Workload(args.users, args.num_questions, sample_pdf(args.pdf_pages), args.use_bank)
+        results = asyncio.run(drive(args, port, proc.pid, workload, gemini))
+        report = {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "verbose")},
+            "llm_calls": gemini.calls,
+            "server_peak_rss_mb": _proc_status(proc.pid)[1],
+            "scenarios": results,
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+        gemini.shutdown()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
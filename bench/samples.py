@@ -0,0 +1,42 @@
+"""Deterministic sample textbooks for the benchmarks, generated with PyMuPDF"""
+import random
+
+import fitz
+
+TOPICS = [
+    "photosynthesis", "cell structure", "newton's laws", "chemical bonding",
+    "the water cycle", "fractions", "world war two", "plate tectonics",
+]
+
+_WORDS = (
+    "energy matter force light cell system process reaction structure change "
+    "example model theory evidence measure result pattern cycle surface layer "
+    "element compound motion pressure balance growth function signal"
+).split()
+
+
+def sample_text(pages, words_per_page=350, seed=0):
+    """Return a list of page texts, each page devoted to one topic"""
+    rng = random.Random(seed)
+    texts = []
+    for page in range(pages):
+        topic = TOPICS[page % len(TOPICS)]
+        sentences = [f"Chapter {page // 4 + 1}: {topic.title()}."]
+        words = 0
+        while words < words_per_page:
+            body = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(8, 16)))
+            sentences.append(f"In {topic}, {body}.")
+            words += len(body.split()) + 2
+        texts.append(" ".join(sentences))
+    return texts
+
+
+def sample_pdf(pages=20, words_per_page=350, seed=0):
+    """Build a text PDF in memory and return its bytes"""
+    doc = fitz.open()
+    for text in sample_text(pages, words_per_page, seed):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, 555, 800), text, fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
@@ -0,0 +1,126 @@
+"""Memory and latency of the RAG chunk/embedding layouts.
+
+Compares the original layout (a list of chunk strings plus a float32
+faiss.IndexFlatL2) with utils.chunk_store (one UTF-8 buffer plus offsets, and
+float32/float16/int8 vectors memory-mapped from disk). Embeddings are random
+unit vectors and queries are noisy copies of stored vectors, so recall is
+measured on a hard, content-free case.
+
+    python -m bench.storage --pages 2000 --pages 20000
+"""
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+import os
+
+import numpy as np
+
+from bench.samples import sample_text
+from utils.chunk_store import EMBEDDING_DTYPES, ChunkStore, VectorStore, load_store, save_store
+
+
+def legacy_chunks(text, chunk_size=300, overlap=50):
+    words = text.split()
+    return [" ".join(words[i:i + chunk_size]) for i in range(0, len(words), chunk_size - overlap)]
+
+
+def _timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        "p50_us": round(times[len(times) // 2] * 1e6, 1),
+        "p95_us": round(times[int(len(times) * 0.95)] * 1e6, 1),
+    }
+
+
+def _dir_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(path) for f in files)
+
+
+def run(pages, dimension, k, queries, seed):
+    rng = np.random.default_rng(seed)
+    text = " ".join(sample_text(pages, seed=seed))
+
+    start = time.perf_counter()
+    chunks = legacy_chunks(text)
+    legacy_build = time.perf_counter() - start
+    start = time.perf_counter()
+    store = ChunkStore.from_text(text)
+    compact_build = time.perf_counter() - start
+    assert len(store) == len(chunks)
+
+    vectors = rng.standard_normal((len(chunks), dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picks = rng.integers(0, len(chunks), queries)
+    query_vecs = vectors[picks] + 0.05 * rng.standard_normal((queries, dimension)).astype(np.float32)
+    chunk_ids = rng.integers(0, len(chunks), 1000)
+
+    result = {
+        "pages": pages,
+        "words": len(text.split()),
+        "chunks": len(chunks),
+        "dimension": dimension,
+        "chunk_text": {
+            "legacy_bytes": sys.getsizeof(chunks) + sum(sys.getsizeof(c) for c in chunks),
+            "compact_bytes": store.nbytes,
+            "legacy_build_ms": round(legacy_build * 1000, 1),
+            "compact_build_ms": round(compact_build * 1000, 1),
+            "legacy_get": _timed(lambda: [chunks[i] for i in chunk_ids], 20),
+            "compact_get": _timed(lambda: [store[i] for i in chunk_ids], 20),
+            "get_batch": len(chunk_ids),
+        },
+        "vectors": {},
+    }
+
+    try:
+        import faiss
+        index = faiss.IndexFlatL2(dimension)
+        index.add(vectors)
+        _, exact = index.search(query_vecs, k)
+        result["vectors"]["faiss_float32"] = {
+            "bytes": index.ntotal * dimension * 4,
+            "query": _timed(lambda: index.search(query_vecs[:1], k), queries),
+            "recall_at_k": 1.0,
+        }
+    except ImportError:
+        exact = VectorStore.build(vectors, "float32").search(query_vecs, k)[1]
+
+    for dtype in EMBEDDING_DTYPES:
+        directory = tempfile.mkdtemp(prefix="rag-bench-")
+        try:
+            save_store(directory, store, VectorStore.build(vectors, dtype))
+            _, mapped = load_store(directory)
+            _, found = mapped.search(query_vecs, k)
+            recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(found, exact)])
+            result["vectors"][dtype] = {
+                "bytes": mapped.nbytes,
+                "disk_bytes": _dir_bytes(directory),
+                "query": _timed(lambda: mapped.search(query_vecs[:1], k), queries),
+                "recall_at_k": round(float(recall), 4),
+            }
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG chunk and embedding storage")
+    parser.add_argument("--pages", type=int, action="append", help="Book size in pages (repeatable)")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    results = [run(p, args.dimension, args.k, args.queries, args.seed) for p in (args.pages or [500, 5000])]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
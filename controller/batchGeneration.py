@@ -0,0 +1,259 @@
+import json
+import os
+import threading
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from . import supabase
+from controller.generateExercise import GenerateExercise
+from utils.helper import parse_exercise_text, build_exercise_rows, exercise_list
+from utils.llm import batch_rate_limiter, LLMBusyError
+
+logger = logging.getLogger(__name__)
+
+JOB_DIR = os.getenv("BATCH_JOB_DIR", "batch_jobs")
+MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", "4"))  # running at once; more are refused with a 429
+MAX_ENTRIES = int(os.getenv("BATCH_MAX_ENTRIES", "200"))
+MAX_COUNT = int(os.getenv("BATCH_MAX_COUNT", "50"))  # exercises per entry
+JOB_RETRY_AFTER = 60
+
+
+class BatchGenerationJob:
+    """
+    Generates and saves exercises for a list of (topic, exercise_type,
+    difficulty, count) entries.
+
+    Entries run on a thread pool of at most MAX_CONCURRENCY workers, paced
+    by the batch rate limiter (BATCH_REQUESTS_PER_MINUTE); at most MAX_JOBS
+    jobs run at once.
+    Book retrieval is done once per chapter (or topic when no chapter is
+    given) and reused by every entry for it. Progress is checkpointed to
+    JOB_DIR/<job_id>.json after each entry so a crashed job can be resumed;
+    an entry that was saved but not yet checkpointed is generated again.
+    """
+
+    def __init__(self, job_id, userId, entries, grade=None, subject=None, sub_topic=None, concurrency=4):
+        self.job_id = job_id
+        self.userId = userId
+        self.grade = grade
+        self.subject = subject
+        self.sub_topic = sub_topic
+        self.concurrency = min(max(1, int(concurrency or 1)), MAX_CONCURRENCY)
+        self.entries = entries
+        self.status = "pending"
+        self.created_at = datetime.utcnow().isoformat()
+        self.updated_at = self.created_at
+        self.lock = threading.Lock()
+        self.retrievals = {}
+        self.retrieval_locks = {}
+
+    @classmethod
+    def create(cls, userId, entries, grade=None, subject=None, sub_topic=None, concurrency=4):
+        if not 1 <= len(entries) <= MAX_ENTRIES:
+            raise ValueError(f"A batch job takes 1 to {MAX_ENTRIES} entries, got {len(entries)}")
+        for e in entries:
+            if e.get("count") is not None and not 1 <= int(e["count"]) <= MAX_COUNT:
+                raise ValueError(f"count must be between 1 and {MAX_COUNT}, got {e['count']}")
+        entries = [
+            {
+                "index": i,
+                "topic": e["topic"],
+                "chapter": e.get("chapter"),
+                "exercise_type": e.get("exercise_type") or "mcq",
+                "difficulty": e.get("difficulty") or "medium",
+                "count": 5 if e.get("count") is None else int(e["count"]),
+                "status": "pending",
+                "saved": 0,
+                "error": None,
+            }
+            for i, e in enumerate(entries)
+        ]
+        return cls(uuid.uuid4().hex, userId, entries, grade, subject, sub_topic, concurrency)
+
+    @staticmethod
+    def checkpoint_path(job_id):
+        return os.path.join(JOB_DIR, f"{job_id}.json")
+
+    @classmethod
+    def load(cls, job_id):
+        """Rebuild a job from its checkpoint file, or return None if there is none"""
+        path = cls.checkpoint_path(job_id)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            state = json.load(f)
+        job = cls(
+            state["job_id"], state["userId"], state["entries"], state.get("grade"),
+            state.get("subject"), state.get("sub_topic"), state.get("concurrency", 4)
+        )
+        job.status = state["status"]
+        job.created_at = state["created_at"]
+        job.updated_at = state["updated_at"]
+        return job
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "userId": self.userId,
+            "grade": self.grade,
+            "subject": self.subject,
+            "sub_topic": self.sub_topic,
+            "concurrency": self.concurrency,
+            "status": self.status,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "entries": self.entries,
+        }
+
+    def progress(self):
+        with self.lock:
+            counts = {}
+            for entry in self.entries:
+                counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+            return {
+                "job_id": self.job_id,
+                "status": self.status,
+                "total": len(self.entries),
+                "completed": counts.get("done", 0),
+                "failed": counts.get("failed", 0),
+                "pending": counts.get("pending", 0) + counts.get("running", 0),
+                "saved": sum(e["saved"] for e in self.entries),
+                "updated_at": self.updated_at,
+                "entries": [dict(e) for e in self.entries],
+            }
+
+    def checkpoint(self):
+        """Write the job state atomically; the caller holds self.lock"""
+        self.updated_at = datetime.utcnow().isoformat()
+        os.makedirs(JOB_DIR, exist_ok=True)
+        path = self.checkpoint_path(self.job_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    def _context_for(self, generator, entry):
+        """Retrieve book context once per chapter and share it across entries"""
+        key = (entry.get("chapter") or entry["topic"]).strip().lower()
+        with self.lock:
+            key_lock = self.retrieval_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self.retrievals:
+                self.retrievals[key] = generator.rag_processor.retrieve_top_chunks(
+                    entry.get("chapter") or entry["topic"], k=10
+                )
+            return self.retrievals[key]
+
+    def _run_entry(self, generator, entry):
+        with self.lock:
+            entry["status"] = "running"
+        try:
+            context_chunks = self._context_for(generator, entry)
+            batch_rate_limiter().acquire()
+            generated = generator.generate_exercise_with_context(
+                topic=entry["topic"],
+                exercise_type=entry["exercise_type"],
+                num_questions=entry["count"],
+                difficulty_level=entry["difficulty"],
+                context_chunks=context_chunks
+            )
+            exercises = exercise_list(parse_exercise_text(entry["exercise_type"], generated))
+            table, rows = build_exercise_rows(
+                entry["exercise_type"], exercises, self.grade, self.subject, entry["topic"], self.sub_topic
+            )
+            if table is None:
+                raise ValueError(f"Unsupported exercise type: {entry['exercise_type']}")
+            if not rows:
+                raise ValueError("No exercises could be generated")
+            supabase.table(table).insert(rows).execute()
+            status, saved, error = "done", len(rows), None
+        except Exception as e:
+            logger.error(f"Batch job {self.job_id} entry {entry['index']} failed: {e}")
+            status, saved, error = "failed", 0, str(e)
+        with self.lock:
+            entry.update(status=status, saved=saved, error=error)
+            self.checkpoint()
+
+    def run(self):
+        """Run every entry that is not done yet (failed entries are retried)"""
+        with self.lock:
+            todo = [e for e in self.entries if e["status"] != "done"]
+            for entry in todo:
+                entry.update(status="pending", error=None)
+            self.status = "running"
+            self.checkpoint()
+        generator = GenerateExercise(self.userId, endpoint="batch")
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(lambda entry: self._run_entry(generator, entry), todo))
+        with self.lock:
+            failed = any(e["status"] == "failed" for e in self.entries)
+            self.status = "completed_with_errors" if failed else "completed"
+            self.checkpoint()
+
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _run(job):
+    try:
+        job.run()
+    except Exception as e:
+        logger.error(f"Batch job {job.job_id} failed: {e}")
+        with job.lock:
+            job.status = "failed"
+            job.checkpoint()
+
+
+def _active(job):
+    return job.status in ("pending", "running")
+
+
+def _register(job):
+    """Add a job to the registry; the caller holds _jobs_lock. Raises LLMBusyError past MAX_JOBS"""
+    running = sum(1 for j in _jobs.values() if _active(j))
+    if running >= MAX_JOBS:
+        raise LLMBusyError(JOB_RETRY_AFTER, f"{running} batch jobs already running")
+    _jobs[job.job_id] = job
+
+
+def _launch(job):
+    with job.lock:
+        job.checkpoint()
+    threading.Thread(target=_run, args=(job,), name=f"batch-{job.job_id}", daemon=True).start()
+    return job
+
+
+def start_batch_job(userId, entries, grade=None, subject=None, sub_topic=None, concurrency=4):
+    """Create a job, checkpoint it and start it in the background"""
+    job = BatchGenerationJob.create(userId, entries, grade, subject, sub_topic, concurrency)
+    with _jobs_lock:
+        _register(job)
+    return _launch(job)
+
+
+def get_batch_job(job_id):
+    """Return a running or finished job from memory, falling back to its checkpoint"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    return job or BatchGenerationJob.load(job_id)
+
+
+def resume_batch_job(job_id):
+    """
+    Restart the unfinished entries of a job from its checkpoint.
+    Returns None if the job is unknown and the job itself if it is still running.
+    """
+    # Check and register under one lock, so concurrent resumes start the job once
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is not None and _active(job):
+            return job
+        job = BatchGenerationJob.load(job_id)
+        if job is None:
+            return None
+        job.status = "pending"
+        _register(job)
+    return _launch(job)
@@ -2,8 +2,9 @@ import google.generativeai as genai
 from google.generativeai import types
 import os
 import dotenv
-from utils.rag import RAGProcessor
+from utils.rag import RAGProcessor, user_storage_dir
 from utils.helper import clean_content
+from utils.llm import configure_gemini, llm_scheduler, LLMBusyError
 import logging
 
 dotenv.load_dotenv()
@@ -13,11 +14,12 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class GenerateExercise:
-    def __init__(self, userId):
+    def __init__(self, userId, endpoint="generate"):
         self.userId = userId
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        self.endpoint = endpoint  # scheduler queue for generation calls, see utils/llm.py
+        configure_gemini()
         self.model = genai.GenerativeModel("gemini-2.0-flash")
-        self.rag_processor = RAGProcessor()
+        self.rag_processor = RAGProcessor(storage_dir=user_storage_dir(userId))
         
     def upload_and_process_book(self, pdf_file):
         """Upload and process a PDF book for RAG"""
@@ -31,11 +33,12 @@ class GenerateExercise:
             print(f"Error uploading book: {e}")
             return {"status": "error", "message": str(e)}
     
-    def generate_exercise_with_context(self, topic, exercise_type="mcq", num_questions=5, difficulty_level="medium"):
-        """Generate exercises based on uploaded book content"""
+    def generate_exercise_with_context(self, topic, exercise_type="mcq", num_questions=5, difficulty_level="medium", context_chunks=None):
+        """Generate exercises based on uploaded book content; pass context_chunks to reuse an earlier retrieval"""
         try:
             # Retrieve relevant context from the book
-            context_chunks = self.rag_processor.retrieve_top_chunks(topic, k=10)
+            if context_chunks is None:
+                context_chunks = self.rag_processor.retrieve_top_chunks(topic, k=10)
             
             if not context_chunks:
                 return self.generate_exercise_without_context(topic, exercise_type, num_questions)
@@ -85,18 +88,24 @@ class GenerateExercise:
             logger.info(f"Context Chunks Retrieved: {len(context_chunks)}")
 
             # Generate AI response with context
+            # GenerationConfig has no system_instruction field, so prepend it like the other prompts
             system_instruction = os.getenv("EXERCISE_SYSTEM_INSTRUCTION")
-            response = self.model.generate_content(
-                contents=mcq_prompt if exercise_type == "mcq" else normal_prompt,
-                generation_config=types.GenerationConfig(
-                    system_instruction=system_instruction
+            prompt = mcq_prompt if exercise_type == "mcq" else normal_prompt
+            full_prompt = f"{system_instruction}\n\n{prompt}" if system_instruction else prompt
+            with llm_scheduler().slot(self.userId, self.endpoint):
+                response = self.model.generate_content(
+                    contents=full_prompt,
+                    generation_config=types.GenerationConfig(
+                        # Add other config params here if needed
+                    )
                 )
-            )
             logger.info(f"Raw AI response: {getattr(response, 'text', repr(response))}")
             cleaned = clean_content(response.text)
             logger.info(f"Cleaned content: {cleaned}")
             return cleaned
 
+        except LLMBusyError:
+            raise
         except Exception as e:
             logger.error(f"Error generating exercise with context: {e}")
             return "Sorry, there was an error generating the exercise with book context."
@@ -108,17 +117,20 @@ class GenerateExercise:
             
             system_instruction = os.getenv("EXERCISE_SYSTEM_INSTRUCTION")
             full_prompt = f"{system_instruction}\n\n{prompt}" if system_instruction else prompt
-            response = self.model.generate_content(
-                contents=full_prompt,
-                generation_config=types.GenerationConfig(
-                    # Add other config params here if needed
+            with llm_scheduler().slot(self.userId, self.endpoint):
+                response = self.model.generate_content(
+                    contents=full_prompt,
+                    generation_config=types.GenerationConfig(
+                        # Add other config params here if needed
+                    )
                 )
-            )
             logger.info(f"Raw AI response (no context): {getattr(response, 'text', repr(response))}")
             cleaned = clean_content(response.text)
             logger.info(f"Cleaned content (no context): {cleaned}")
             return cleaned
  
+        except LLMBusyError:
+            raise
         except Exception as e:
             logger.error(f"Error generating exercise: {e}")
             return "Sorry, there was an error generating the exercise."
@@ -152,15 +164,18 @@ class GenerateExercise:
             
             system_instruction = "You are a helpful assistant that answers questions based on provided book content. Be accurate and cite the relevant parts of the content when possible."
             full_prompt = f"{system_instruction}\n\n{qa_prompt}"
-            response = self.model.generate_content(
-                contents=full_prompt,
-                generation_config=types.GenerationConfig(
-                    # Add other config params here if needed
+            with llm_scheduler().slot(self.userId, "ask"):
+                response = self.model.generate_content(
+                    contents=full_prompt,
+                    generation_config=types.GenerationConfig(
+                        # Add other config params here if needed
+                    )
                 )
-            )
             
             return response.text
             
+        except LLMBusyError:
+            raise
         except Exception as e:
             print(f"Error answering question: {e}")
             return "Sorry, there was an error processing your question."
\ No newline at end of file
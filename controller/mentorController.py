@@ -6,34 +6,39 @@ import uuid
 from datetime import datetime
 from . import supabase  # Import the supabase client from __init__.py
 from model.ai_chats import ChatConversationModel
+from utils.llm import configure_gemini, llm_scheduler, LLMBusyError
+from utils.conversation_memory import get_conversation_memory
 
 dotenv.load_dotenv()
 
 class Mentor:
     def __init__(self, userId):
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        configure_gemini()
         self.model = genai.GenerativeModel("gemini-2.0-flash")
         self.supabase = supabase  # Use the configured supabase client
         
         # Initialize the chat model and ensure table exists
         self.chat_model = ChatConversationModel(self.supabase)
         self.chat_model.ensure_table_exists()
+        self.memory = get_conversation_memory()
     
     def chat_with_mentor(self, userId, message):
         try:
             system_instruction = os.getenv("MENTOR_SYSTEM_INSTRUCTION")
-            full_message = f"{system_instruction}\n\n{message}" if system_instruction else message
-            response = self.model.generate_content(
-                contents=full_message,
-                generation_config=types.GenerationConfig(
-                    # Add other config params here if needed
+            # Summary of older turns plus the recent ones, within MENTOR_PROMPT_TOKEN_BUDGET
+            full_message = self.memory.build_prompt(userId, system_instruction, message)
+            with llm_scheduler().slot(userId, "mentor"):
+                response = self.model.generate_content(
+                    contents=full_message,
+                    generation_config=types.GenerationConfig(
+                        # Add other config params here if needed
+                    )
                 )
-            )
             
             ai_response = response.text
             
-            # Save conversation using the model
-            saved_conversation = self.chat_model.insert_conversation(
+            # Save conversation and update the user's cached window
+            saved_conversation = self.memory.record_turn(
                 user_id=userId,
                 user_message=message,
                 mentor_response=ai_response
@@ -46,6 +51,8 @@ class Mentor:
             
             return ai_response
             
+        except LLMBusyError:
+            raise
         except Exception as e:
             print(f"Error in chat_with_mentor: {e}")
             return response.text if 'response' in locals() else "Sorry, there was an error processing your request."
@@ -0,0 +1,94 @@
+import uuid
+from datetime import datetime
+
+
+class ChatConversationModel:
+    """
+    Mentor conversations stored in the Supabase `ai_chats` table.
+
+    Rolling summaries live in `ai_chat_summaries`, one row per user;
+    save_summary upserts on user_id, which needs the unique constraint:
+
+        create table if not exists ai_chat_summaries (
+            user_id text primary key,
+            summary text not null default '',
+            summarized_until text not null default '',
+            updated_at timestamptz not null default now()
+        );
+    """
+
+    def __init__(self, supabase, table_name="ai_chats", summary_table="ai_chat_summaries"):
+        self.supabase = supabase
+        self.table_name = table_name
+        self.summary_table = summary_table
+
+    def ensure_table_exists(self):
+        """Check the table is reachable; tables are created through Supabase migrations"""
+        try:
+            self.supabase.table(self.table_name).select("id").limit(1).execute()
+            return True
+        except Exception as e:
+            print(f"Chat table '{self.table_name}' is not available: {e}")
+            return False
+
+    def insert_conversation(self, user_id, user_message, mentor_response):
+        """Save one user message and the mentor's reply"""
+        try:
+            record = {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "user_message": user_message,
+                "mentor_response": mentor_response,
+                "created_at": datetime.utcnow().isoformat(),
+            }
+            result = self.supabase.table(self.table_name).insert(record).execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            print(f"Error saving conversation: {e}")
+            return None
+
+    def get_user_conversations(self, user_id, limit=50):
+        """Return the user's most recent conversations, newest first"""
+        try:
+            result = (
+                self.supabase.table(self.table_name)
+                .select("*")
+                .eq("user_id", user_id)
+                .order("created_at", desc=True)
+                .limit(limit)
+                .execute()
+            )
+            return result.data or []
+        except Exception as e:
+            print(f"Error fetching conversations: {e}")
+            return []
+
+    def get_summary(self, user_id):
+        """Return the user's rolling summary row ({summary, summarized_until}) or None"""
+        try:
+            result = (
+                self.supabase.table(self.summary_table)
+                .select("*")
+                .eq("user_id", user_id)
+                .limit(1)
+                .execute()
+            )
+            return result.data[0] if result.data else None
+        except Exception as e:
+            print(f"Error fetching conversation summary: {e}")
+            return None
+
+    def save_summary(self, user_id, summary, summarized_until):
+        """Store the summary of every conversation up to `summarized_until` (one row per user)"""
+        try:
+            record = {
+                "user_id": user_id,
+                "summary": summary,
+                "summarized_until": summarized_until,
+                "updated_at": datetime.utcnow().isoformat(),
+            }
+            result = self.supabase.table(self.summary_table).upsert(record, on_conflict="user_id").execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            print(f"Error saving conversation summary: {e}")
+            return None
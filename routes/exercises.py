@@ -1,10 +1,13 @@
 from controller.generateExercise import GenerateExercise
+from utils.llm import LLMBusyError
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Body
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, List
 import logging
 from controller import supabase
-from utils.helper import parse_mcq_text, parse_sqs_text, parse_lqs_text, parse_blanks_text, parse_true_false_text
+from utils.helper import parse_mcq_text, parse_sqs_text, parse_lqs_text, parse_blanks_text, parse_true_false_text, parse_exercise_text, build_exercise_rows, exercise_list
+from utils.exercise_bank import get_exercise_bank
+from controller.batchGeneration import start_batch_job, get_batch_job, resume_batch_job, MAX_ENTRIES, MAX_COUNT
 
 router = APIRouter()
 
@@ -18,11 +21,29 @@ class ExerciseRequest(BaseModel):
     exercise_type: Optional[str] = "mcq"
     difficulty_level: Optional[str] = "medium"
     num_questions: Optional[int] = 5
+    grade: Optional[str] = None
+    subject: Optional[str] = None
+    use_bank: Optional[bool] = False  # serve saved exercises first, generate only the shortfall
 
 class QuestionRequest(BaseModel):
     userId: str
     question: str
 
+class BatchEntry(BaseModel):
+    topic: str
+    exercise_type: Optional[str] = "mcq"
+    difficulty: Optional[str] = "medium"
+    count: Optional[int] = Field(5, ge=1, le=MAX_COUNT)
+    chapter: Optional[str] = None  # entries with the same chapter share one book retrieval
+
+class BatchJobRequest(BaseModel):
+    userId: str
+    entries: List[BatchEntry] = Field(..., max_length=MAX_ENTRIES)
+    grade: Optional[str] = None
+    subject: Optional[str] = None
+    sub_topic: Optional[str] = None
+    concurrency: Optional[int] = 4  # capped at BATCH_MAX_CONCURRENCY
+
 @router.post("/exercise/upload-book")
 async def upload_book(userId: str = Form(...), file: UploadFile = File(...)):
     """Upload and process a PDF book for exercise generation"""
@@ -41,58 +62,77 @@ async def upload_book(userId: str = Form(...), file: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# LLM-bound routes are plain functions so FastAPI runs them in its threadpool
+# and a request waiting for a model slot does not block the event loop; the
+# pool is sized at startup (reserve_scheduler_threads) so each waiting request
+# has a thread and the scheduler, not the pool, decides who goes next
 @router.post("/exercise/generate")
-async def generate_exercise(request: ExerciseRequest):
+def generate_exercise(request: ExerciseRequest):
     """Generate exercises based on uploaded book content"""
     try:
         logger.info(f"Received generate_exercise request: {request}")
-        exercise_generator = GenerateExercise(request.userId)
-        exercises = exercise_generator.generate_exercise_with_context(
-            topic=request.topic,
-            exercise_type=request.exercise_type,
-            num_questions=request.num_questions,
-            difficulty_level=request.difficulty_level
-        )
-        logger.info(f"Generated exercises: {exercises}")
-        # If MCQ, parse to array
-        if request.exercise_type.lower() in ["multiple choice", "mcq", "mcqs"]:
-            if isinstance(exercises, str):
-                exercises = parse_mcq_text(exercises)
-        # If True/False, parse to array
-        elif request.exercise_type.lower() in ["true/false", "true_false", "true false", "tf"]:
-            if isinstance(exercises, str):
-                exercises = parse_true_false_text(exercises)
-        # If SQS, parse to array
-        elif request.exercise_type.lower() in ["short answer", "short_questions", "short question", "sqs"]:
-            if isinstance(exercises, str):
-                exercises = parse_sqs_text(exercises)
-        # If LQS, parse to array
-        elif request.exercise_type.lower() in ["long questions", "long_questions", "long question", "lqs"]:
-            if isinstance(exercises, str):
-                exercises = parse_lqs_text(exercises)
-        # If Fill in the Blanks, parse to array
-        elif request.exercise_type.lower() in ["fill in the blanks", "fill_blanks", "fill blank", "blanks"]:
-            if isinstance(exercises, str):
-                exercises = parse_blanks_text(exercises)
+        banked = []
+        if request.use_bank:
+            bank = get_exercise_bank()
+            banked = bank.find(
+                exercise_type=request.exercise_type,
+                topic=request.topic,
+                count=request.num_questions,
+                grade=request.grade,
+                subject=request.subject
+            )
+            logger.info(f"Served {len(banked)} of {request.num_questions} exercises from the bank")
+        shortfall = request.num_questions - len(banked)
+        exercises = banked
+        generation_error = None
+        if shortfall > 0:
+            exercise_generator = GenerateExercise(request.userId)
+            generated = exercise_generator.generate_exercise_with_context(
+                topic=request.topic,
+                exercise_type=request.exercise_type,
+                num_questions=shortfall,
+                difficulty_level=request.difficulty_level
+            )
+            logger.info(f"Generated exercises: {generated}")
+            generated = parse_exercise_text(request.exercise_type, generated)
+            if not banked:
+                exercises = generated
+            else:
+                # Flashcards and match columns come back as {"Flashcards": [...]}
+                generated_list = exercise_list(generated)
+                if not generated_list:
+                    generation_error = generated if isinstance(generated, str) else "No exercises could be generated"
+                exercises = banked + bank.drop_duplicates(request.exercise_type, generated_list, banked)[:shortfall]
+        if banked and isinstance(exercises, list):
+            for i, ex in enumerate(exercises, start=1):
+                if isinstance(ex, dict):
+                    ex["id"] = i
         if not exercises:
             exercises = "Sorry, no exercises could be generated."
+        if generation_error:
+            # Banked exercises are still returned; say why there are fewer than asked for
+            return {"exercises": exercises, "generation_error": generation_error}
         return {"exercises": exercises}
+    except LLMBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         logger.error(f"Error in generate_exercise: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/exercise/ask")
-async def ask_question_about_book(request: QuestionRequest):
+def ask_question_about_book(request: QuestionRequest):
     """Ask a question about the uploaded book"""
     try:
         exercise_generator = GenerateExercise(request.userId)
         answer = exercise_generator.ask_question_about_book(request.question)
         return {"answer": answer}
+    except LLMBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/exercise/generate-simple")
-async def generate_simple_exercise(request: ExerciseRequest):
+def generate_simple_exercise(request: ExerciseRequest):
     """Generate exercises without book context"""
     try:
         exercise_generator = GenerateExercise(request.userId)
@@ -122,6 +162,8 @@ async def generate_simple_exercise(request: ExerciseRequest):
             if isinstance(exercises, str):
                 exercises = parse_blanks_text(exercises)
         return {"exercises": exercises}
+    except LLMBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -136,101 +178,54 @@ async def save_exercise(
 ):
     """Save generated exercises to the appropriate table."""
     try:
-        if exerciseType.lower() in ["multiple choice", "mcq", "mcqs"]:
-            for ex in exerciseData:
-                if not ex.get("question"):
-                    continue
-                mcq = {
-                    "grade": grade,
-                    "subject": subject,
-                    "topic": topic,
-                    "sub_topic": sub_topic,
-                    "question": ex["question"],
-                    "options": ex.get("options", []),  # Store as JSON
-                    "correct_answer": ex.get("correct", "")  # Store as text
-                }
-                supabase.table("mcqs").insert(mcq).execute()
-        elif exerciseType.lower() in ["fill in the blanks", "fill_blanks", "fill blank", "blanks"]:
-            for ex in exerciseData:
-                if not ex.get("question"):
-                    continue
-                fill_blank = {
-                    "grade": grade,
-                    "subject": subject,
-                    "topic": topic,
-                    "sub_topic": sub_topic,
-                    "question": ex["question"],
-                    "answer": ex.get("answer", "")
-                }
-                supabase.table("fill_blanks").insert(fill_blank).execute()
-        elif exerciseType.lower() in ["short answer", "short_questions", "short question", "sqs"]:
-            for ex in exerciseData:
-                if not ex.get("question"):
-                    continue
-                short_q = {
-                    "grade": grade,
-                    "subject": subject,
-                    "topic": topic,
-                    "sub_topic": sub_topic,
-                    "question": ex["question"]
-                }
-                supabase.table("short_questions").insert(short_q).execute()
-        elif exerciseType.lower() in ["long questions", "long_questions", "long question", "lqs"]:
-            for ex in exerciseData:
-                if not ex.get("question"):
-                    continue
-                long_q = {
-                    "grade": grade,
-                    "subject": subject,
-                    "topic": topic,
-                    "sub_topic": sub_topic,
-                    "question": ex["question"]
-                }
-                supabase.table("long_questions").insert(long_q).execute()
-        elif exerciseType.lower() in ["true/false", "true_false", "true false", "tf"]:
-            for ex in exerciseData:
-                if not ex.get("question"):
-                    continue
-                tf_q = {
-                    "grade": grade,
-                    "subject": subject,
-                    "topic": topic,
-                    "sub_topic": sub_topic,
-                    "question": ex["question"],
-                    "answer": ex.get("answer", "")
-                }
-                supabase.table("true_false").insert(tf_q).execute()
-        elif exerciseType.lower() in ["match the columns", "match_columns", "match the column", "match columns"]:
-            for ex in exerciseData:
-                if not ex.get("columnA") or not ex.get("columnB"):
-                    continue
-                match_columns = {
-                    "grade": grade,
-                    "subject": subject,
-                    "topic": topic,
-                    "sub_topic": sub_topic,
-                    "columna": ex.get("columnA", []),  # Store as JSON
-                    "columnb": ex.get("columnB", []),  # Store as JSON
-                    "answers": ex.get("answers", {})  # Store as JSON (mapping)
-                }
-                supabase.table("match_columns").insert(match_columns).execute()
-        elif exerciseType.lower() in ["flashcards", "flashcard"]:
-            for ex in exerciseData:
-                if not ex.get("question"):
-                    continue
-                flashcard = {
-                    "grade": grade,
-                    "subject": subject,
-                    "topic": topic,
-                    "sub_topic": sub_topic,
-                    "question": ex.get("question", ""),
-                    "hint": ex.get("hint", ""),
-                    "answer": ex.get("answer", "")
-                }
-                supabase.table("flashcards").insert(flashcard).execute()
-        else:
+        table, rows = build_exercise_rows(exerciseType, exerciseData, grade, subject, topic, sub_topic)
+        if table is None:
             print("Saving as generic exercise:", exerciseData)
+        elif rows:
+            supabase.table(table).insert(rows).execute()
         return {"message": "Exercises saved successfully!"}
     except Exception as e:
         print(f"Error saving exercises: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/exercise/batch")
+async def start_batch(request: BatchJobRequest):
+    """Start a background job that generates and saves exercises for many topics"""
+    if not request.entries:
+        raise HTTPException(status_code=400, detail="At least one entry is required")
+    try:
+        job = start_batch_job(
+            userId=request.userId,
+            entries=[entry.model_dump() for entry in request.entries],
+            grade=request.grade,
+            subject=request.subject,
+            sub_topic=request.sub_topic,
+            concurrency=request.concurrency
+        )
+        return {"job_id": job.job_id, "status": job.status, "total": len(job.entries)}
+    except LLMBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error starting batch job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/exercise/batch/{job_id}")
+async def get_batch_progress(job_id: str):
+    """Report the progress of a batch job"""
+    job = get_batch_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job.progress()
+
+@router.post("/exercise/batch/{job_id}/resume")
+async def resume_batch(job_id: str):
+    """Resume the unfinished entries of a batch job from its checkpoint"""
+    try:
+        job = resume_batch_job(job_id)
+    except LLMBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return {"job_id": job.job_id, "status": job.status}
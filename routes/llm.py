@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from utils.llm import llm_scheduler
+
+router = APIRouter()
+
+@router.get("/llm/queue")
+async def get_llm_queue():
+    """Model calls in flight and queued, with admissions, rejections and queue waits per endpoint"""
+    return llm_scheduler().stats()
@@ -1,4 +1,5 @@
 from controller.mentorController import Mentor
+from utils.llm import LLMBusyError
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
@@ -8,12 +9,15 @@ class ChatRequest(BaseModel):
     userId: str
     message: str
 
+# Plain def: runs in the threadpool while it waits for a model slot
 @router.post("/mentor/chat")
-async def chat_with_mentor(request: ChatRequest):
+def chat_with_mentor(request: ChatRequest):
     try:
         mentor = Mentor(request.userId)
         response = mentor.chat_with_mentor(request.userId, request.message)
         return {"response": response}
+    except LLMBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
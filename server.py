@@ -4,6 +4,8 @@ from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 from routes.mentor import router as mentor_router
 from routes.exercises import router as exercise_router
+from routes.llm import router as llm_router
+from utils.llm import reserve_scheduler_threads
 import os
 
 app = FastAPI()
@@ -23,6 +25,12 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # Include routers
 app.include_router(mentor_router, prefix="/api")
 app.include_router(exercise_router, prefix="/api")
+app.include_router(llm_router, prefix="/api")
+
+@app.on_event("startup")
+async def size_threadpool():
+    # LLM routes wait for a model slot on a pool thread; give every admissible request one
+    reserve_scheduler_threads()
 
 @app.get("/")
 async def read_root():
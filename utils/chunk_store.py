@@ -0,0 +1,277 @@
+import json
+import os
+import re
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are still serialized within the process
+    fcntl = None
+
+STORE_VERSION = 1
+_VERSION_NAME = re.compile(r"[0-9a-f]{32}")  # uuid4().hex, see save_store
+EMBEDDING_DTYPES = ("float32", "float16", "int8")
+
+
+class ChunkStore:
+    """
+    Overlapping word chunks kept as one UTF-8 buffer.
+
+    The text is split into non-overlapping segments of `chunk_size - overlap`
+    words, stored back to back and separated by single spaces; `offsets[j]` is
+    the byte where segment j starts. Chunk i starts at segment i and runs for
+    `chunk_size` words, so each overlapped chunk is rebuilt on demand and reads
+    exactly like `" ".join(words[i * step:i * step + chunk_size])`.
+    """
+
+    def __init__(self, buffer, offsets, n_words, chunk_size=300, overlap=50):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.n_words = int(n_words)
+        self.chunk_size = int(chunk_size)
+        self.overlap = int(overlap)
+        self.step = self.chunk_size - self.overlap
+
+    @classmethod
+    def from_text(cls, text, chunk_size=300, overlap=50):
+        words = text.split()
+        step = chunk_size - overlap
+        segments = [" ".join(words[j:j + step]).encode("utf-8") for j in range(0, len(words), step)]
+        offsets = np.zeros(len(segments) + 1, dtype=np.int64)
+        if segments:
+            # +1 for the separating space; the sentinel is len(buffer) + 1
+            np.cumsum([len(s) + 1 for s in segments], out=offsets[1:])
+        return cls(b" ".join(segments), offsets, len(words), chunk_size, overlap)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _segment_words(self, j):
+        return min(self.step, self.n_words - j * self.step)
+
+    def _slice(self, start, end):
+        return bytes(self.buffer[start:end])
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chunk index out of range")
+        # Whole segments are contiguous in the buffer; only the last one may be cut
+        remaining, j = self.chunk_size, i
+        while j < len(self) and self._segment_words(j) <= remaining:
+            remaining -= self._segment_words(j)
+            j += 1
+        parts = []
+        if j > i:
+            parts.append(self._slice(self.offsets[i], self.offsets[j] - 1))
+        if remaining and j < len(self):
+            segment = self._slice(self.offsets[j], self.offsets[j + 1] - 1)
+            parts.append(b" ".join(segment.split(b" ", remaining)[:remaining]))
+        return b" ".join(parts).decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nbytes(self):
+        return len(self.buffer) + self.offsets.nbytes
+
+    def save(self, path):
+        np.save(os.path.join(path, "chunk_text.npy"), np.frombuffer(self.buffer, dtype=np.uint8))
+        np.save(os.path.join(path, "chunk_offsets.npy"), self.offsets)
+        return {"n_words": self.n_words, "chunk_size": self.chunk_size, "overlap": self.overlap}
+
+    @classmethod
+    def load(cls, path, meta, mmap=True):
+        mode = "r" if mmap else None
+        buffer = np.load(os.path.join(path, "chunk_text.npy"), mmap_mode=mode)
+        offsets = np.load(os.path.join(path, "chunk_offsets.npy"), mmap_mode=mode)
+        return cls(buffer, offsets, meta["n_words"], meta["chunk_size"], meta["overlap"])
+
+
+class VectorStore:
+    """
+    Exact L2 search over embeddings stored as float32, float16 or int8.
+
+    int8 uses per-dimension scalar quantization: x ~= (code + 128) * scale + minimum.
+    Codes are searched in blocks, so a memory-mapped store is never fully
+    decoded; distances are computed against the stored (dequantized) vectors.
+    """
+
+    def __init__(self, codes, dtype, sq_norms, scale=None, minimum=None, block_size=4096):
+        self.codes = codes
+        self.dtype = dtype
+        self.sq_norms = sq_norms
+        self.scale = scale
+        self.minimum = minimum
+        self.block_size = block_size
+
+    @classmethod
+    def build(cls, vectors, dtype="float16"):
+        if dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        scale = minimum = None
+        if dtype == "int8":
+            minimum = vectors.min(axis=0)
+            scale = (vectors.max(axis=0) - minimum) / 255.0
+            scale[scale == 0] = 1.0
+            codes = (np.clip(np.rint((vectors - minimum) / scale), 0, 255) - 128).astype(np.int8)
+        else:
+            codes = vectors.astype(dtype)
+        store = cls(codes, dtype, None, scale, minimum)
+        store.sq_norms = np.concatenate([
+            np.einsum("ij,ij->i", block, block) for block in store._decoded_blocks()
+        ]) if len(codes) else np.zeros(0, dtype=np.float32)
+        return store
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def dimension(self):
+        return self.codes.shape[1]
+
+    @property
+    def nbytes(self):
+        extra = 0 if self.scale is None else self.scale.nbytes + self.minimum.nbytes
+        return self.codes.nbytes + self.sq_norms.nbytes + extra
+
+    def _decoded_blocks(self):
+        for start in range(0, len(self.codes), self.block_size):
+            block = np.asarray(self.codes[start:start + self.block_size], dtype=np.float32)
+            if self.dtype == "int8":
+                block = (block + 128.0) * self.scale + self.minimum
+            yield block
+
+    def search(self, queries, k):
+        """Return (distances, indices) of the k nearest vectors, like faiss.Index.search"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, len(self))
+        if k <= 0:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+        if self.dtype == "int8":
+            # q . x = (q * scale) . code + q . (128 * scale + minimum)
+            weights = queries * self.scale
+            bias = queries @ (128.0 * self.scale + self.minimum)
+        q_norms = np.einsum("ij,ij->i", queries, queries)
+        best_d = np.full((len(queries), 0), np.inf, dtype=np.float32)
+        best_i = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self.codes), self.block_size):
+            codes = np.asarray(self.codes[start:start + self.block_size], dtype=np.float32)
+            if self.dtype == "int8":
+                dots = codes @ weights.T + bias
+            else:
+                dots = codes @ queries.T
+            dist = q_norms[:, None] - 2 * dots.T + self.sq_norms[start:start + len(codes)][None, :]
+            ids = np.broadcast_to(np.arange(start, start + len(codes)), dist.shape)
+            best_d = np.concatenate([best_d, dist], axis=1)
+            best_i = np.concatenate([best_i, ids], axis=1)
+            if best_d.shape[1] > k:
+                keep = np.argpartition(best_d, k - 1, axis=1)[:, :k]
+                best_d = np.take_along_axis(best_d, keep, axis=1)
+                best_i = np.take_along_axis(best_i, keep, axis=1)
+        order = np.argsort(best_d, axis=1)
+        return np.take_along_axis(best_d, order, axis=1), np.take_along_axis(best_i, order, axis=1)
+
+    def save(self, path):
+        np.save(os.path.join(path, "vectors.npy"), np.asarray(self.codes))
+        np.save(os.path.join(path, "vector_norms.npy"), np.asarray(self.sq_norms, dtype=np.float32))
+        if self.dtype == "int8":
+            np.save(os.path.join(path, "vector_scale.npy"), self.scale)
+            np.save(os.path.join(path, "vector_minimum.npy"), self.minimum)
+        return {"embedding_dtype": self.dtype}
+
+    @classmethod
+    def load(cls, path, meta, mmap=True):
+        mode = "r" if mmap else None
+        codes = np.load(os.path.join(path, "vectors.npy"), mmap_mode=mode)
+        sq_norms = np.load(os.path.join(path, "vector_norms.npy"))
+        scale = minimum = None
+        if meta["embedding_dtype"] == "int8":
+            scale = np.load(os.path.join(path, "vector_scale.npy"))
+            minimum = np.load(os.path.join(path, "vector_minimum.npy"))
+        return cls(codes, meta["embedding_dtype"], sq_norms, scale, minimum)
+
+
+_save_locks = {}
+_save_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _store_lock(directory):
+    """Serialize saves to one store across threads and, via flock, processes"""
+    with _save_locks_guard:
+        lock = _save_locks.setdefault(os.path.abspath(directory), threading.Lock())
+    with lock, open(os.path.join(directory, ".lock"), "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _current_version(directory):
+    try:
+        with open(os.path.join(directory, "CURRENT")) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def save_store(directory, chunks, vectors):
+    """
+    Write a chunk and vector store as a new version under `directory`.
+
+    Each save goes to its own subdirectory and the CURRENT file is swapped
+    atomically, so readers (including ones holding memory maps of the old
+    version) never see a half-written store. Saves to the same directory are
+    serialized; the new and the previous version are kept, older version
+    directories removed (nothing else in `directory` is touched).
+    """
+    os.makedirs(directory, exist_ok=True)
+    with _store_lock(directory):
+        previous = _current_version(directory)
+        version = uuid.uuid4().hex
+        path = os.path.join(directory, version)
+        os.makedirs(path)
+        meta = {"version": STORE_VERSION}
+        meta.update(chunks.save(path))
+        meta.update(vectors.save(path))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        pointer = os.path.join(directory, f"CURRENT.{version}.tmp")
+        with open(pointer, "w") as f:
+            f.write(version)
+        os.replace(pointer, os.path.join(directory, "CURRENT"))
+        for name in os.listdir(directory):
+            if (name not in (version, previous) and _VERSION_NAME.fullmatch(name)
+                    and os.path.isdir(os.path.join(directory, name))):
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    return path
+
+
+def load_store(directory, mmap=True):
+    """Return (chunks, vectors) for the current version in `directory`, or (None, None)"""
+    for _ in range(3):
+        version = _current_version(directory)
+        if version is None:
+            return None, None
+        path = os.path.join(directory, version)
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            return ChunkStore.load(path, meta, mmap), VectorStore.load(path, meta, mmap)
+        except (OSError, ValueError):
+            # Replaced and cleaned up by two newer saves while we read it; follow CURRENT again
+            continue
+    return None, None
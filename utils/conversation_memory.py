@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import google.generativeai as genai
+from utils.llm import configure_gemini, llm_scheduler
+
+DEFAULT_SUMMARY_INSTRUCTION = (
+    "You keep the running memory of a conversation between a student and their mentor. "
+    "Update the summary below with the new exchanges. Keep the student's goals, what they "
+    "already understand, what they struggle with and anything the mentor promised to follow "
+    "up on. Drop small talk. Answer with the updated summary only, in at most {words} words."
+)
+
+_SUMMARY_LABEL = "Summary of the earlier conversation:\n"
+_RECENT_LABEL = "Recent conversation:\n"
+
+
+def estimate_tokens(text):
+    """Rough Gemini token count (about four characters per token), no API call needed"""
+    return len(text) // 4 + 1 if text else 0
+
+
+def _truncate_tokens(text, tokens):
+    """Cut `text` to about `tokens` tokens"""
+    if estimate_tokens(text) <= tokens:
+        return text
+    return text[:tokens * 4] if tokens > 0 else ""
+
+
+def format_turn(turn):
+    return f"Student: {turn['user_message']}\nMentor: {turn['mentor_response']}"
+
+
+def summarize_turns(previous_summary, turns, max_tokens=400, user_id=None):
+    """Fold `turns` into `previous_summary` with one Gemini call"""
+    configure_gemini()
+    instruction = os.getenv("MENTOR_SUMMARY_INSTRUCTION", DEFAULT_SUMMARY_INSTRUCTION)
+    prompt = (
+        f"{instruction.format(words=max_tokens * 3 // 4)}\n\n"
+        f"Current summary:\n{previous_summary or '(none yet)'}\n\n"
+        "New exchanges:\n" + "\n\n".join(format_turn(t) for t in turns)
+    )
+    with llm_scheduler().slot(user_id, "summary"):
+        response = genai.GenerativeModel("gemini-2.0-flash").generate_content(contents=prompt)
+    return response.text.strip()
+
+
+class _UserWindow:
+    def __init__(self, summary, summarized_until, turns):
+        self.summary = summary or ""
+        self.summarized_until = summarized_until or ""
+        self.turns = turns             # oldest first, all newer than summarized_until
+        self.loaded_at = time.monotonic()
+        self.summarizing = False
+        self.lock = threading.Lock()
+
+
+class ConversationMemory:
+    """
+    Bounded context for mentor chats.
+
+    Each user's recent turns and rolling summary are cached in-process.
+    Every turn not yet in the summary is sent verbatim; once `summarize_every`
+    turns have piled up behind the newest `window_turns`, those older turns
+    are folded into the summary in the background and the summary is saved
+    next to the history, so a prompt carries the summary plus between
+    `window_turns` and `window_turns + summarize_every - 1` turns. Prompts are
+    assembled newest-first within `token_budget` tokens, so a turn costs the
+    same however long the conversation has run.
+    """
+
+    def __init__(self, chat_model, summarize=summarize_turns, window_turns=6, summarize_every=6,
+                 token_budget=3000, summary_max_tokens=400, cache_users=1000, cache_ttl=300):
+        self.chat_model = chat_model
+        self.summarize = summarize
+        self.window_turns = window_turns
+        self.summarize_every = summarize_every
+        self.token_budget = token_budget
+        self.summary_max_tokens = summary_max_tokens
+        self.cache_users = cache_users
+        self.cache_ttl = cache_ttl
+        self.windows = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mentor-summary")
+
+    @property
+    def max_cached_turns(self):
+        return self.window_turns + 2 * self.summarize_every
+
+    def _load(self, user_id):
+        saved = self.chat_model.get_summary(user_id) or {}
+        summarized_until = saved.get("summarized_until") or ""
+        rows = self.chat_model.get_user_conversations(user_id, limit=self.max_cached_turns)
+        turns = [
+            {"user_message": r.get("user_message") or "", "mentor_response": r.get("mentor_response") or "",
+             "created_at": r.get("created_at") or ""}
+            for r in reversed(rows) if (r.get("created_at") or "") > summarized_until
+        ]
+        return _UserWindow(saved.get("summary"), summarized_until, turns)
+
+    def window(self, user_id):
+        """Return the cached window for a user, loading it from Supabase when missing or stale"""
+        with self.lock:
+            window = self.windows.get(user_id)
+            if window is not None and time.monotonic() - window.loaded_at < self.cache_ttl:
+                self.windows.move_to_end(user_id)
+                return window
+        window = self._load(user_id)
+        with self.lock:
+            self.windows[user_id] = window
+            self.windows.move_to_end(user_id)
+            while len(self.windows) > self.cache_users:
+                self.windows.popitem(last=False)
+        return window
+
+    def build_prompt(self, user_id, system_instruction, message):
+        """System instruction, summary and as many recent turns as fit the budget, then the message"""
+        window = self.window(user_id)
+        with window.lock:
+            summary, turns = window.summary, list(window.turns)
+
+        # Labels and separators are counted too, so the whole prompt stays within budget
+        remaining = self.token_budget - estimate_tokens(system_instruction) - estimate_tokens(f"Student: {message}")
+        remaining -= estimate_tokens(_SUMMARY_LABEL) + estimate_tokens(_RECENT_LABEL)
+        summary = _truncate_tokens(summary, min(self.summary_max_tokens, remaining))
+        remaining -= estimate_tokens(summary)
+        recent = []
+        # Every unsummarized turn: older ones reach the summary only once folded
+        for turn in reversed(turns):
+            text = format_turn(turn)
+            if estimate_tokens(text) + 1 > remaining:
+                break
+            recent.insert(0, text)
+            remaining -= estimate_tokens(text) + 1
+
+        parts = [system_instruction] if system_instruction else []
+        if summary:
+            parts.append(_SUMMARY_LABEL + summary)
+        if recent:
+            parts.append(_RECENT_LABEL + "\n\n".join(recent))
+        if summary or recent:
+            message = f"Student: {message}"
+        parts.append(message)
+        return "\n\n".join(parts)
+
+    def record_turn(self, user_id, user_message, mentor_response):
+        """Save a turn to the history, add it to the window and summarize if it is due"""
+        # Take the window before inserting: a window loaded afterwards would already hold the row
+        window = self.window(user_id)
+        saved = self.chat_model.insert_conversation(user_id, user_message, mentor_response)
+        created_at = (saved or {}).get("created_at") or datetime.utcnow().isoformat()
+        with window.lock:
+            if not any(t["created_at"] == created_at for t in window.turns):
+                window.turns.append({
+                    "user_message": user_message,
+                    "mentor_response": mentor_response,
+                    "created_at": created_at,
+                })
+            del window.turns[:-self.max_cached_turns]
+            due = (not window.summarizing
+                   and len(window.turns) >= self.window_turns + self.summarize_every)
+            if due:
+                window.summarizing = True
+                fold = window.turns[:-self.window_turns]
+                previous = window.summary
+        if due:
+            self.executor.submit(self._fold, user_id, window, previous, fold)
+        return saved
+
+    def _fold(self, user_id, window, previous, fold):
+        try:
+            summary = _truncate_tokens(
+                self.summarize(previous, fold, self.summary_max_tokens, user_id), self.summary_max_tokens
+            )
+            until = fold[-1]["created_at"]
+            with window.lock:
+                window.summary = summary
+                window.summarized_until = until
+                window.turns = [t for t in window.turns if t["created_at"] > until]
+            self.chat_model.save_summary(user_id, summary, until)
+        except Exception as e:
+            print(f"Error summarizing conversation for {user_id}: {e}")
+        finally:
+            with window.lock:
+                window.summarizing = False
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_conversation_memory():
+    """Return the process-wide conversation memory, creating it on first use"""
+    global _memory
+    if _memory is None:
+        with _memory_lock:
+            if _memory is None:
+                from controller import supabase
+                from model.ai_chats import ChatConversationModel
+                _memory = ConversationMemory(
+                    ChatConversationModel(supabase),
+                    window_turns=int(os.getenv("MENTOR_WINDOW_TURNS", "6")),
+                    summarize_every=int(os.getenv("MENTOR_SUMMARIZE_EVERY", "6")),
+                    token_budget=int(os.getenv("MENTOR_PROMPT_TOKEN_BUDGET", "3000")),
+                    summary_max_tokens=int(os.getenv("MENTOR_SUMMARY_MAX_TOKENS", "400")),
+                    cache_ttl=float(os.getenv("MENTOR_CACHE_SECONDS", "300")),
+                )
+    return _memory
@@ -0,0 +1,232 @@
+import os
+import re
+import threading
+import numpy as np
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+
+class EmbeddingBackend:
+    """
+    Turns sentences into L2-normalized float32 embeddings.
+
+    Sentences are tokenized once (truncated to `max_seq_length`), sorted by
+    length and grouped into batches of at most `batch_tokens` padded tokens,
+    so short queries are not padded to the length of long chunks. Subclasses
+    provide the tokenizer and `_encode_batch`.
+    """
+
+    def __init__(self, max_seq_length=256, batch_tokens=16384, max_batch_size=256):
+        self.max_seq_length = max_seq_length
+        self.batch_tokens = batch_tokens
+        self.max_batch_size = max_batch_size
+        self.tokenizer = None
+        self._tokenizer_lock = threading.Lock()  # fast tokenizers are not safe to share across threads
+
+    def get_sentence_embedding_dimension(self):
+        raise NotImplementedError
+
+    def _encode_batch(self, features):
+        """Return one embedding per row of the padded features"""
+        raise NotImplementedError
+
+    def _tokenize(self, sentences):
+        with self._tokenizer_lock:
+            return self.tokenizer(
+                sentences, truncation=True, max_length=self.max_seq_length, padding=False
+            )
+
+    def _batches(self, lengths):
+        """Yield index batches, longest sentences first, within the padded-token budget"""
+        batch, width = [], 0
+        for i in np.argsort(-np.asarray(lengths), kind="stable"):
+            new_width = max(width, lengths[i])
+            if batch and (new_width * (len(batch) + 1) > self.batch_tokens or len(batch) >= self.max_batch_size):
+                yield batch
+                batch, new_width = [], lengths[i]
+            batch.append(i)
+            width = new_width
+        if batch:
+            yield batch
+
+    def _pad(self, tokens, batch):
+        width = max(len(tokens["input_ids"][i]) for i in batch)
+        pad_id = self.tokenizer.pad_token_id or 0
+        features = {}
+        for name in tokens.keys():
+            fill = pad_id if name == "input_ids" else 0
+            array = np.full((len(batch), width), fill, dtype=np.int64)
+            for row, i in enumerate(batch):
+                values = tokens[name][i]
+                array[row, :len(values)] = values
+            features[name] = array
+        return features
+
+    def encode(self, sentences, show_progress_bar=False, **kwargs):
+        """Encode a sentence or a list of sentences, keeping the input order"""
+        single = isinstance(sentences, str)
+        sentences = [sentences] if single else list(sentences)
+        embeddings = np.zeros((len(sentences), self.get_sentence_embedding_dimension()), dtype=np.float32)
+        if sentences:
+            tokens = self._tokenize(sentences)
+            lengths = [len(ids) for ids in tokens["input_ids"]]
+            for batch in self._batches(lengths):
+                embeddings[batch] = self._encode_batch(self._pad(tokens, batch))
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            embeddings /= norms
+        return embeddings[0] if single else embeddings
+
+
+class TorchBackend(EmbeddingBackend):
+    """SentenceTransformer model run through PyTorch on the CPU"""
+
+    def __init__(self, model_name=DEFAULT_MODEL, **kwargs):
+        super().__init__(**kwargs)
+        import torch
+        from sentence_transformers import SentenceTransformer
+        self.torch = torch
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.model.max_seq_length = self.max_seq_length
+        self.model.eval()
+        self.tokenizer = self.model.tokenizer
+
+    def get_sentence_embedding_dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+    def _encode_batch(self, features):
+        with self.torch.inference_mode():
+            output = self.model({name: self.torch.from_numpy(array) for name, array in features.items()})
+        return output["sentence_embedding"].float().numpy()
+
+
+def export_onnx(model_name=DEFAULT_MODEL, cache_dir=None, quantize=False):
+    """
+    Export a mean-pooling SentenceTransformer model to ONNX, once.
+
+    The transformer and its tokenizer are written to
+    EMBEDDING_ONNX_DIR/<model>/; with quantize=True a dynamically
+    int8-quantized copy is made as well. Exporting needs torch; running the
+    exported model only needs onnxruntime and the tokenizer.
+    """
+    cache_dir = cache_dir or os.getenv("EMBEDDING_ONNX_DIR", "onnx_models")
+    target = os.path.join(cache_dir, re.sub(r"[^\w.-]", "_", model_name))
+    fp32_path = os.path.join(target, "model.onnx")
+    int8_path = os.path.join(target, "model-int8.onnx")
+
+    if not os.path.exists(fp32_path):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        st = SentenceTransformer(model_name, device="cpu")
+        pooling = st[1].get_config_dict()
+        if not (pooling.get("pooling_mode_mean_tokens") or pooling.get("pooling_mode") == "mean"):
+            raise ValueError(f"Only mean-pooling models can be exported, {model_name} is not one")
+
+        class TokenEmbeddings(torch.nn.Module):
+            def __init__(self, transformer):
+                super().__init__()
+                self.transformer = transformer
+
+            def forward(self, input_ids, attention_mask, token_type_ids=None):
+                return self.transformer(
+                    input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+                ).last_hidden_state
+
+        os.makedirs(target, exist_ok=True)
+        dummy = st.tokenizer(["export this sentence"], return_tensors="pt")
+        names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy]
+        axes = {n: {0: "batch", 1: "sequence"} for n in names + ["token_embeddings"]}
+        tmp_path = f"{fp32_path}.tmp"
+        torch.onnx.export(
+            TokenEmbeddings(st[0].auto_model.eval()),
+            tuple(dummy[n] for n in names),
+            tmp_path,
+            input_names=names,
+            output_names=["token_embeddings"],
+            dynamic_axes=axes,
+            opset_version=14,
+            dynamo=False,
+        )
+        st.tokenizer.save_pretrained(target)
+        os.replace(tmp_path, fp32_path)
+
+    if quantize and not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        tmp_path = f"{int8_path}.tmp"
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+
+    return int8_path if quantize else fp32_path
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    The same model exported to ONNX and run with ONNX Runtime, optionally int8-quantized.
+
+    Needs onnxruntime (plus onnx and ml_dtypes for the int8 export), pinned in
+    requirements.txt but only imported when EMBEDDING_BACKEND selects it.
+    Check parity on the deployed model with bench/embeddings.py before
+    switching a deployment over.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, quantize=False, cache_dir=None, **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx embedding backend needs the onnxruntime package") from e
+        from transformers import AutoTokenizer
+        path = export_onnx(model_name, cache_dir, quantize)
+        self.tokenizer = AutoTokenizer.from_pretrained(os.path.dirname(path))
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+
+    def get_sentence_embedding_dimension(self):
+        return self.dimension
+
+    def _encode_batch(self, features):
+        inputs = {name: array for name, array in features.items() if name in self.input_names}
+        token_embeddings = self.session.run(None, inputs)[0]
+        # Mean pooling over real tokens, as in the SentenceTransformer pipeline
+        mask = features["attention_mask"][:, :, None].astype(np.float32)
+        return (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+_factories = {
+    "torch": TorchBackend,
+    "onnx": OnnxBackend,
+    "onnx-int8": lambda **kwargs: OnnxBackend(quantize=True, **kwargs),
+}
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def register_embedding_backend(name, factory):
+    """Make another backend available to EMBEDDING_BACKEND; factory(**settings) returns it"""
+    _factories[name] = factory
+
+
+def create_embedding_backend(name="torch", model_name=DEFAULT_MODEL, max_seq_length=256, batch_tokens=16384):
+    if name not in _factories:
+        raise ValueError(f"Unknown embedding backend: {name} (choose from {', '.join(_factories)})")
+    return _factories[name](model_name=model_name, max_seq_length=max_seq_length, batch_tokens=batch_tokens)
+
+
+def get_embedding_backend():
+    """
+    Process-wide backend chosen by EMBEDDING_BACKEND (torch, onnx, onnx-int8),
+    EMBEDDING_MODEL, EMBEDDING_MAX_SEQ_LENGTH and EMBEDDING_BATCH_TOKENS.
+    """
+    settings = (
+        os.getenv("EMBEDDING_BACKEND", "torch"),
+        os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL),
+        int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", "256")),
+        int(os.getenv("EMBEDDING_BATCH_TOKENS", "16384")),
+    )
+    with _backends_lock:
+        if settings not in _backends:
+            _backends[settings] = create_embedding_backend(*settings)
+        return _backends[settings]
@@ -0,0 +1,217 @@
+import numpy as np
+import threading
+import time
+import os
+import re
+from utils.helper import EXERCISE_TABLE_ALIASES, exercise_table
+from utils.embeddings import get_embedding_backend
+
+# Shape of the saved rows when served back through /exercise/generate
+_ROW_FORMATS = {
+    "mcqs": lambda r: {"type": "Multiple Choice", "question": r.get("question"),
+                       "options": r.get("options") or [], "correct": r.get("correct_answer")},
+    "true_false": lambda r: {"type": "True/False", "question": r.get("question"), "answer": r.get("answer", "")},
+    "fill_blanks": lambda r: {"type": "Fill in the Blanks", "question": r.get("question"), "answer": r.get("answer", "")},
+    "short_questions": lambda r: {"type": "Short Answer", "question": r.get("question")},
+    "long_questions": lambda r: {"type": "Long Questions", "question": r.get("question")},
+    "match_columns": lambda r: {"columnA": r.get("columna") or [], "columnB": r.get("columnb") or [],
+                                "answers": r.get("answers") or {}},
+    "flashcards": lambda r: {"question": r.get("question"), "hint": r.get("hint", ""), "answer": r.get("answer", "")},
+}
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", str(text or "").lower())).strip()
+
+
+def _row_text(table, row):
+    if table == "match_columns":
+        return " ".join(str(item) for item in (row.get("columna") or []))
+    return row.get("question") or ""
+
+
+class _TableCache:
+    def __init__(self, dimension):
+        self.rows = []
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        self.ids = set()
+        self.by_key = {}       # (grade, subject, topic) -> row positions
+        self.cursor = None     # newest created_at loaded so far
+
+
+class ExerciseBank:
+    """
+    Local, indexed copy of the saved exercise tables.
+
+    Rows are indexed by (grade, subject, topic) and by an embedding of their
+    question text, and pulled incrementally from Supabase by `created_at`.
+    One thread refreshes at a time, fetching and embedding outside the index
+    lock; while it does, other lookups serve the current snapshot.
+    """
+
+    def __init__(self, supabase, model=None, refresh_interval=60, page_size=1000):
+        self.supabase = supabase
+        self.model = model or get_embedding_backend()
+        self.refresh_interval = refresh_interval
+        self.page_size = page_size
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.tables = {table: _TableCache(self.dimension) for table in EXERCISE_TABLE_ALIASES}
+        self.last_refresh = None
+        self.lock = threading.Lock()           # guards the table caches
+        self.refresh_lock = threading.RLock()  # one refresh at a time; refresh() re-enters it
+
+    def _embed(self, texts):
+        vectors = np.asarray(self.model.encode(texts, show_progress_bar=False), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _add_rows(self, table, rows):
+        # Only the refreshing thread writes the caches, so reading ids here needs no lock
+        cache = self.tables[table]
+        new_rows, ids = [], set()
+        for row in rows:
+            if row.get("id") not in cache.ids and row.get("id") not in ids:
+                new_rows.append(row)
+                ids.add(row.get("id"))
+        if not new_rows:
+            return 0
+        vectors = self._embed([_row_text(table, r) for r in new_rows])
+        with self.lock:
+            for row in new_rows:
+                position = len(cache.rows)
+                cache.rows.append(row)
+                cache.ids.add(row.get("id"))
+                key = (_normalize(row.get("grade")), _normalize(row.get("subject")), _normalize(row.get("topic")))
+                cache.by_key.setdefault(key, []).append(position)
+                if row.get("created_at") and (cache.cursor is None or row["created_at"] > cache.cursor):
+                    cache.cursor = row["created_at"]
+            cache.vectors = np.vstack([cache.vectors, vectors])
+        return len(new_rows)
+
+    def refresh(self):
+        """Pull rows created since the last refresh into the cache"""
+        added = 0
+        with self.refresh_lock:
+            for table, cache in self.tables.items():
+                cursor = cache.cursor
+                rows, start = [], 0
+                while True:
+                    query = self.supabase.table(table).select("*")
+                    if cursor is not None:
+                        # gte plus the id check picks up rows sharing the cursor timestamp
+                        query = query.gte("created_at", cursor)
+                    page = query.order("created_at").range(start, start + self.page_size - 1).execute().data or []
+                    rows.extend(page)
+                    if len(page) < self.page_size:
+                        break
+                    start += self.page_size
+                # One embedding pass and one vstack per table, however many pages came back
+                added += self._add_rows(table, rows)
+            self.last_refresh = time.time()
+        return added
+
+    def _stale(self):
+        return self.last_refresh is None or time.time() - self.last_refresh >= self.refresh_interval
+
+    def refresh_if_stale(self):
+        if not self._stale():
+            return
+        # Before the first load there is nothing to serve, so wait for it; afterwards
+        # a lookup that finds a refresh running keeps the current snapshot
+        if not self.refresh_lock.acquire(blocking=self.last_refresh is None):
+            return
+        try:
+            if self._stale():
+                self.refresh()
+        except Exception as e:
+            print(f"Error refreshing exercise bank: {e}")
+        finally:
+            self.refresh_lock.release()
+
+    def find(self, exercise_type, topic, count, grade=None, subject=None, min_similarity=0.5, duplicate_similarity=0.92):
+        """
+        Return up to `count` distinct saved exercises for the topic.
+
+        Rows saved under the same (grade, subject, topic) come first, then rows
+        from the same grade and subject whose question text is similar to the
+        topic. Near-duplicate questions are dropped.
+        """
+        table = exercise_table(exercise_type)
+        if table is None or count <= 0:
+            return []
+        self.refresh_if_stale()
+        grade, subject, topic_key = _normalize(grade), _normalize(subject), _normalize(topic)
+        query = self._embed([topic])[0]
+
+        with self.lock:
+            cache = self.tables[table]
+            if not cache.rows:
+                return []
+            exact = set()
+            candidates = []
+            for (row_grade, row_subject, row_topic), positions in cache.by_key.items():
+                if (grade and row_grade != grade) or (subject and row_subject != subject):
+                    continue
+                candidates.extend(positions)
+                if row_topic == topic_key:
+                    exact.update(positions)
+            if not candidates:
+                return []
+            candidates = np.array(candidates)
+            similarity = cache.vectors[candidates] @ query
+            score = similarity + np.isin(candidates, list(exact)).astype(np.float32)
+            picked, picked_vectors, seen_texts = [], [], set()
+            for i in np.argsort(-score):
+                position = candidates[i]
+                if position not in exact and similarity[i] < min_similarity:
+                    continue
+                text = _normalize(_row_text(table, cache.rows[position]))
+                vector = cache.vectors[position]
+                if not text or text in seen_texts:
+                    continue
+                if picked_vectors and max(float(v @ vector) for v in picked_vectors) >= duplicate_similarity:
+                    continue
+                seen_texts.add(text)
+                picked.append(position)
+                picked_vectors.append(vector)
+                if len(picked) == count:
+                    break
+            rows = [cache.rows[p] for p in picked]
+
+        return [dict(_ROW_FORMATS[table](row), bank_id=row.get("id"), source="bank") for row in rows]
+
+    def drop_duplicates(self, exercise_type, exercises, existing):
+        """Remove generated exercises whose text matches one already served from the bank"""
+        table = exercise_table(exercise_type)
+        if table is None:
+            return exercises
+        seen = {_normalize(_row_text(table, _as_row(table, e))) for e in existing}
+        return [
+            e for e in exercises
+            if not isinstance(e, dict) or _normalize(_row_text(table, _as_row(table, e))) not in seen
+        ]
+
+
+def _as_row(table, exercise):
+    if table == "match_columns":
+        return {"columna": exercise.get("columnA")}
+    return exercise
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_exercise_bank():
+    """Return the process-wide exercise bank, creating it on first use"""
+    global _bank
+    if _bank is None:
+        with _bank_lock:
+            if _bank is None:
+                from controller import supabase
+                _bank = ExerciseBank(
+                    supabase,
+                    refresh_interval=float(os.getenv("EXERCISE_BANK_REFRESH_SECONDS", "60")),
+                )
+    return _bank
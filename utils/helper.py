@@ -239,3 +239,90 @@ def parse_true_false_text(tf_text):
         })
     return questions
 
+
+# Exercise type aliases accepted by the API, keyed by the table the type is saved to
+EXERCISE_TABLE_ALIASES = {
+    "mcqs": ["multiple choice", "mcq", "mcqs"],
+    "true_false": ["true/false", "true_false", "true false", "tf"],
+    "short_questions": ["short answer", "short_questions", "short question", "sqs"],
+    "long_questions": ["long questions", "long_questions", "long question", "lqs"],
+    "fill_blanks": ["fill in the blanks", "fill_blanks", "fill blank", "blanks"],
+    "match_columns": ["match the columns", "match_columns", "match the column", "match columns"],
+    "flashcards": ["flashcards", "flashcard"],
+}
+
+def exercise_table(exercise_type):
+    """Return the Supabase table for an exercise type, or None if it is not a known type"""
+    kind = (exercise_type or "").lower()
+    for table, aliases in EXERCISE_TABLE_ALIASES.items():
+        if kind in aliases:
+            return table
+    return None
+
+_TEXT_PARSERS = {
+    "mcqs": parse_mcq_text,
+    "true_false": parse_true_false_text,
+    "short_questions": parse_sqs_text,
+    "long_questions": parse_lqs_text,
+    "fill_blanks": parse_blanks_text,
+}
+
+def parse_exercise_text(exercise_type, exercises):
+    """
+    Parses AI-generated exercise text into a list of question dicts when there
+    is a parser for the type; anything else is returned unchanged.
+    """
+    parser = _TEXT_PARSERS.get(exercise_table(exercise_type))
+    if parser and isinstance(exercises, str):
+        return parser(exercises)
+    return exercises
+
+def exercise_list(exercises):
+    """Return the list of exercises from parsed text or the model's JSON output"""
+    if isinstance(exercises, list):
+        return exercises
+    if isinstance(exercises, dict):
+        for value in exercises.values():
+            if isinstance(value, list):
+                return value
+    return []
+
+def build_exercise_rows(exercise_type, exercise_data, grade=None, subject=None, topic=None, sub_topic=None):
+    """
+    Maps parsed exercises to rows of their Supabase table.
+    Returns (table, rows); table is None for unknown exercise types.
+    """
+    table = exercise_table(exercise_type)
+    tags = {"grade": grade, "subject": subject, "topic": topic, "sub_topic": sub_topic}
+    rows = []
+    for ex in exercise_data or []:
+        if not isinstance(ex, dict):
+            continue
+        if table == "match_columns":
+            if not ex.get("columnA") or not ex.get("columnB"):
+                continue
+            rows.append(dict(tags,
+                columna=ex.get("columnA", []),  # Store as JSON
+                columnb=ex.get("columnB", []),  # Store as JSON
+                answers=ex.get("answers", {})   # Store as JSON (mapping)
+            ))
+            continue
+        if not ex.get("question"):
+            continue
+        if table == "mcqs":
+            rows.append(dict(tags,
+                question=ex["question"],
+                options=ex.get("options", []),  # Store as JSON
+                correct_answer=ex.get("correct", "")  # Store as text
+            ))
+        elif table in ("fill_blanks", "true_false"):
+            rows.append(dict(tags, question=ex["question"], answer=ex.get("answer", "")))
+        elif table in ("short_questions", "long_questions"):
+            rows.append(dict(tags, question=ex["question"]))
+        elif table == "flashcards":
+            rows.append(dict(tags,
+                question=ex.get("question", ""),
+                hint=ex.get("hint", ""),
+                answer=ex.get("answer", "")
+            ))
+    return table, rows
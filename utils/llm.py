@@ -0,0 +1,325 @@
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+import google.generativeai as genai
+
+
+def configure_gemini():
+    """Configure the Gemini client from the environment.
+
+    GEMINI_API_ENDPOINT points the client at another host (for example the
+    local fake server in bench/) and switches it to the REST transport.
+    """
+    endpoint = os.getenv("GEMINI_API_ENDPOINT")
+    if endpoint:
+        genai.configure(
+            api_key=os.getenv("GEMINI_API_KEY"),
+            transport="rest",
+            client_options={"api_endpoint": endpoint},
+        )
+    else:
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+
+
+class RateLimiter:
+    """Spaces calls evenly so no more than `per_minute` start in any minute"""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_batch_limiter = None
+_batch_limiter_lock = threading.Lock()
+
+
+def batch_rate_limiter():
+    """
+    Process-wide limiter for batch generation jobs only, sized by
+    BATCH_REQUESTS_PER_MINUTE (0 disables it). Interactive routes are not
+    paced by it; they go through llm_scheduler() below.
+    """
+    global _batch_limiter
+    with _batch_limiter_lock:
+        if _batch_limiter is None:
+            _batch_limiter = RateLimiter(float(os.getenv("BATCH_REQUESTS_PER_MINUTE", "15")))
+        return _batch_limiter
+
+
+class LLMBusyError(Exception):
+    """The LLM queue is saturated; the caller should retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after, reason="queue full"):
+        super().__init__(f"Too many requests waiting for the model ({reason}), retry in {retry_after}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+DEFAULT_ENDPOINT_WEIGHTS = "mentor=8,ask=4,generate=2,summary=1,batch=1"
+# Wait instead of being shed and stay out of max_queue; batch jobs bound themselves
+# (BATCH_MAX_JOBS jobs of at most BATCH_MAX_CONCURRENCY workers each)
+BULK_ENDPOINTS = ("batch",)
+
+
+class _Ticket:
+    __slots__ = ("tag", "seq", "user_id", "endpoint", "weight", "ready", "evicted", "cond")
+
+    def __init__(self, tag, seq, user_id, endpoint, weight, lock):
+        self.tag = tag
+        self.seq = seq
+        self.user_id = user_id
+        self.endpoint = endpoint
+        self.weight = weight
+        self.ready = False
+        self.evicted = False
+        self.cond = threading.Condition(lock)  # only this ticket's thread is woken
+
+    def __lt__(self, other):
+        return (self.tag, self.seq) < (other.tag, other.seq)
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.admitted = 0
+        self.rejected = 0
+        self.queued = 0
+        self.waits = deque(maxlen=1000)
+
+
+class LLMScheduler:
+    """
+    Admission control and fair ordering for model calls.
+
+    At most `concurrency` calls run at once. The rest wait in per-endpoint
+    queues under two-level start-time fair queuing: endpoints share capacity
+    by weight, however many users each has (interactive chat far ahead of
+    bulk generation), and within an endpoint every user gets a fair share.
+    Interactive requests are shed with LLMBusyError when the queue or the
+    user's share of it is full, when the calls queued at their weight or above
+    would take longer than `queue_timeout`, or when they wait that long
+    anyway; a full queue first makes room for a request by evicting the
+    newest queued one of lower weight. Bulk requests (BULK_ENDPOINTS) are
+    never shed and do not count against `max_queue`: they only take their
+    endpoint's weighted share of capacity.
+    """
+
+    def __init__(self, concurrency=4, max_queue=64, max_queue_per_user=4, queue_timeout=30.0, weights=None):
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.queue_timeout = queue_timeout
+        self.weights = weights or parse_weights(DEFAULT_ENDPOINT_WEIGHTS)
+        self.lock = threading.Lock()
+        self.queues = defaultdict(list)   # endpoint -> heap of tickets tagged per user
+        self.queued = 0
+        self.bulk_queued = 0              # of self.queued, tickets from BULK_ENDPOINTS
+        self.seq = itertools.count()
+        self.virtual_time = 0.0           # across endpoints
+        self.endpoint_tag = {}            # endpoint -> start tag of its next dispatch
+        self.user_time = {}               # endpoint -> tag of its last dispatched ticket
+        self.last_tag = {}
+        self.queued_by_user = Counter()
+        self.in_flight = 0
+        self.service_time = 2.0  # moving average of call duration, for Retry-After
+        self.endpoints = defaultdict(_EndpointStats)
+
+    def _retry_after(self):
+        interactive = self.queued - self.bulk_queued
+        return max(1, math.ceil((interactive + 1) * self.service_time / max(self.concurrency, 1)))
+
+    def _reject(self, endpoint, reason):
+        self.endpoints[endpoint].rejected += 1
+        raise LLMBusyError(self._retry_after(), reason)
+
+    def _enqueue(self, user_id, endpoint, weight):
+        queue = self.queues[endpoint]
+        if not queue:
+            self.endpoint_tag[endpoint] = max(self.endpoint_tag.get(endpoint, 0.0), self.virtual_time)
+        flow = (endpoint, user_id)
+        tag = max(self.user_time.get(endpoint, 0.0), self.last_tag.get(flow, 0.0)) + 1.0
+        self.last_tag[flow] = tag
+        ticket = _Ticket(tag, next(self.seq), user_id, endpoint, weight, self.lock)
+        heapq.heappush(queue, ticket)
+        self.queued += 1
+        if endpoint in BULK_ENDPOINTS:
+            self.bulk_queued += 1
+        self.queued_by_user[user_id] += 1
+        self.endpoints[endpoint].queued += 1
+        return ticket
+
+    def _unqueue(self, ticket):
+        self.queued -= 1
+        if ticket.endpoint in BULK_ENDPOINTS:
+            self.bulk_queued -= 1
+        self.queued_by_user[ticket.user_id] -= 1
+        self.endpoints[ticket.endpoint].queued -= 1
+
+    def _remove(self, ticket):
+        queue = self.queues[ticket.endpoint]
+        queue.remove(ticket)
+        heapq.heapify(queue)
+        self._unqueue(ticket)
+
+    def _dispatch(self):
+        while self.queued and self.in_flight < self.concurrency:
+            endpoint = min((e for e, q in self.queues.items() if q),
+                           key=lambda e: (self.endpoint_tag[e], self.queues[e][0].seq))
+            ticket = heapq.heappop(self.queues[endpoint])
+            self.virtual_time = self.endpoint_tag[endpoint]
+            self.endpoint_tag[endpoint] += 1.0 / ticket.weight
+            self.user_time[endpoint] = ticket.tag
+            ticket.ready = True
+            self.in_flight += 1
+            self._unqueue(ticket)
+            ticket.cond.notify()
+        if not self.queued:
+            self.last_tag.clear()
+            self.queued_by_user.clear()
+
+    def _expected_wait(self, weight):
+        ahead = sum(1 for e, q in self.queues.items() if e not in BULK_ENDPOINTS for t in q if t.weight >= weight)
+        return (ahead + 1) * self.service_time / max(self.concurrency, 1)
+
+    def _evict_for(self, weight):
+        """Drop the newest queued ticket weighing less than `weight`; False if there is none"""
+        victims = [t for e, q in self.queues.items() if e not in BULK_ENDPOINTS for t in q if t.weight < weight]
+        if not victims:
+            return False
+        victim = max(victims, key=lambda t: (-t.weight, t.seq))
+        self._remove(victim)
+        victim.evicted = True
+        victim.cond.notify()
+        return True
+
+    def _acquire(self, user_id, endpoint):
+        shed = endpoint not in BULK_ENDPOINTS
+        stats = self.endpoints[endpoint]
+        weight = self.weights.get(endpoint, 1.0)
+        start = time.monotonic()
+        with self.lock:
+            if not self.queued and self.in_flight < self.concurrency:
+                self.in_flight += 1
+            else:
+                if shed and self.queued_by_user[user_id] >= self.max_queue_per_user:
+                    self._reject(endpoint, "too many requests from this user")
+                if shed and self._expected_wait(weight) > self.queue_timeout:
+                    self._reject(endpoint, "queue too slow")
+                if shed and self.queued - self.bulk_queued >= self.max_queue and not self._evict_for(weight):
+                    self._reject(endpoint, "queue full")
+                ticket = self._enqueue(user_id, endpoint, weight)
+                deadline = start + self.queue_timeout
+                while not ticket.ready:
+                    if ticket.evicted:
+                        self._reject(endpoint, "displaced by a higher-priority request")
+                    remaining = deadline - time.monotonic() if shed else None
+                    if remaining is not None and remaining <= 0:
+                        self._remove(ticket)
+                        self._reject(endpoint, "timed out waiting")
+                    ticket.cond.wait(remaining)
+            wait = time.monotonic() - start
+            stats.admitted += 1
+            stats.waits.append(wait)
+        return wait
+
+    def _release(self, duration):
+        with self.lock:
+            self.in_flight -= 1
+            self.service_time = 0.8 * self.service_time + 0.2 * duration
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, user_id, endpoint):
+        """Wait for a turn to call the model; yields the seconds spent queued"""
+        if self.concurrency <= 0:
+            yield 0.0
+            return
+        wait = self._acquire(user_id, endpoint)
+        start = time.monotonic()
+        try:
+            yield wait
+        finally:
+            self._release(time.monotonic() - start)
+
+    def stats(self):
+        """In-flight and queued calls, and admissions, rejections and queue waits per endpoint"""
+        with self.lock:
+            endpoints = {}
+            for name, stats in self.endpoints.items():
+                waits = sorted(stats.waits)
+                pick = lambda q: round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 1) if waits else None
+                endpoints[name] = {
+                    "queued": stats.queued,
+                    "admitted": stats.admitted,
+                    "rejected": stats.rejected,
+                    "wait_ms": {"p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99),
+                                "max": pick(1.0)},
+                }
+            return {
+                "concurrency": self.concurrency,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "bulk_queued": self.bulk_queued,
+                "endpoints": endpoints,
+            }
+
+
+def parse_weights(text):
+    """Parse "mentor=8,generate=2" into {"mentor": 8.0, "generate": 2.0}"""
+    weights = {}
+    for item in text.split(","):
+        if "=" in item:
+            name, weight = item.split("=", 1)
+            weights[name.strip()] = float(weight)
+    return weights
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def llm_scheduler():
+    """
+    Process-wide scheduler configured by LLM_MAX_CONCURRENCY (0 disables it),
+    LLM_MAX_QUEUE, LLM_MAX_QUEUE_PER_USER, LLM_QUEUE_TIMEOUT_SECONDS and
+    LLM_ENDPOINT_WEIGHTS.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler(
+                concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+                max_queue=int(os.getenv("LLM_MAX_QUEUE", "64")),
+                max_queue_per_user=int(os.getenv("LLM_MAX_QUEUE_PER_USER", "4")),
+                queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "30")),
+                weights=parse_weights(os.getenv("LLM_ENDPOINT_WEIGHTS", DEFAULT_ENDPOINT_WEIGHTS)),
+            )
+        return _scheduler
+
+
+def reserve_scheduler_threads(headroom=40):
+    """
+    Grow the threadpool that runs plain-def routes so every request the
+    scheduler can hold (queued or in flight) has its own thread, with
+    `headroom` threads left for other routes. Otherwise requests beyond the
+    pool size wait first-come in anyio's queue, where the scheduler cannot
+    see, prioritize or shed them. Call from app startup, inside the event loop.
+    """
+    from anyio.to_thread import current_default_thread_limiter
+    scheduler = llm_scheduler()
+    limiter = current_default_thread_limiter()
+    limiter.total_tokens = max(limiter.total_tokens, scheduler.max_queue + scheduler.concurrency + headroom)
+    return limiter.total_tokens
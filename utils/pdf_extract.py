@@ -0,0 +1,92 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import fitz
+
+# Kept free of heavy imports: pool workers are spawned and import only this module
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def pdf_workers():
+    """Process pool size from RAG_PDF_WORKERS (default: one per CPU)"""
+    return int(os.getenv("RAG_PDF_WORKERS") or os.cpu_count() or 1)
+
+
+def pdf_parallel_min_pages():
+    """Documents shorter than RAG_PDF_PARALLEL_MIN_PAGES are extracted in-process"""
+    return int(os.getenv("RAG_PDF_PARALLEL_MIN_PAGES", "32"))
+
+
+def _get_pool(workers):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn, not fork: the API process runs threads and torch
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+
+
+def page_ranges(page_count, workers, min_pages_per_shard=8):
+    """Split pages into contiguous ranges, about four per worker to even out slow pages"""
+    shards = max(1, min(workers * 4, page_count // min_pages_per_shard))
+    size, extra = divmod(page_count, shards)
+    ranges, start = [], 0
+    for i in range(shards):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def extract_page_range(path, start, stop):
+    """Worker: open the document by path and return the text of pages [start, stop) in order"""
+    with fitz.open(path) as doc:
+        return "".join(doc[i].get_text() for i in range(start, stop))
+
+
+def extract_pdf_text(data, workers=None, min_pages=None):
+    """
+    Extract the text of a PDF given as bytes.
+
+    Large documents are split into page ranges that a process pool extracts
+    in parallel; results come back in page order and are joined, giving the
+    same text as walking the pages in one process.
+    """
+    workers = pdf_workers() if workers is None else workers
+    min_pages = pdf_parallel_min_pages() if min_pages is None else min_pages
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        page_count = doc.page_count
+        if workers <= 1 or page_count < max(min_pages, 2):
+            return "".join(page.get_text() for page in doc)
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(data)
+        path = f.name
+    try:
+        ranges = page_ranges(page_count, workers)
+        starts, stops = zip(*ranges)
+        try:
+            pool = _get_pool(workers)
+            return "".join(pool.map(extract_page_range, [path] * len(ranges), starts, stops))
+        except BrokenProcessPool:
+            _reset_pool()
+            return "".join(extract_page_range(path, start, stop) for start, stop in ranges)
+    finally:
+        os.unlink(path)
@@ -1,50 +1,70 @@
-from sentence_transformers import SentenceTransformer
-import faiss
 import numpy as np
-import fitz
+import hashlib
 import os
+import re
+from utils.chunk_store import ChunkStore, VectorStore, save_store, load_store
+from utils.pdf_extract import extract_pdf_text
+from utils.embeddings import get_embedding_backend
+
+def user_storage_dir(user_id):
+    """Directory holding a user's indexed book under RAG_STORAGE_DIR"""
+    base = os.getenv("RAG_STORAGE_DIR", "rag_store")
+    name = re.sub(r"[^\w.-]", "_", str(user_id))
+    if not name or name.startswith("."):
+        # ".", ".." and hidden names would point at the store root or above it
+        name = "_" + hashlib.sha256(str(user_id).encode()).hexdigest()[:32]
+    path = os.path.join(base, name)
+    if os.path.dirname(os.path.realpath(path)) != os.path.realpath(base):
+        raise ValueError(f"Invalid user id for storage: {user_id!r}")
+    return path
 
 class RAGProcessor:
-    def __init__(self):
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+    def __init__(self, storage_dir=None, embedding_dtype=None):
+        self.model = get_embedding_backend()  # shared across requests, see utils/embeddings.py
+        self.storage_dir = storage_dir
+        # float32, float16 or int8 (scalar-quantized); int8 is both the smallest and the
+        # fastest to search, float16 pays a half-to-float conversion on every query
+        self.embedding_dtype = embedding_dtype or os.getenv("RAG_EMBEDDING_DTYPE", "int8")
         self.chunks = []
-        self.faiss_index = None
+        self.vector_store = None
+        if storage_dir:
+            self.load()
+    
+    def load(self):
+        """Memory-map the stored chunks and embeddings, if any"""
+        chunks, vector_store = load_store(self.storage_dir)
+        if chunks is not None:
+            self.chunks, self.vector_store = chunks, vector_store
+        return chunks is not None
     
     def extract_text_from_pdf(self, pdf_file):
         """Extract text from PDF file"""
-        doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        return text
+        return extract_pdf_text(pdf_file.read())
     
     def chunk_text(self, text, chunk_size=300, overlap=50):
         """Split text into chunks with overlap"""
-        words = text.split()
-        chunks = []
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = " ".join(words[i:i + chunk_size])
-            chunks.append(chunk)
-        return chunks
+        return ChunkStore.from_text(text, chunk_size, overlap)
     
-    def embed_chunks(self, chunks):
+    def embed_chunks(self, chunks, batch_size=256):
         """Generate embeddings for chunks"""
-        return self.model.encode(chunks, show_progress_bar=True)
+        # Chunks are rebuilt from the store, so only one batch of strings is alive at a time
+        batches = []
+        for start in range(0, len(chunks), batch_size):
+            batch = [chunks[i] for i in range(start, min(start + batch_size, len(chunks)))]
+            batches.append(self.model.encode(batch, show_progress_bar=False))
+        return np.vstack(batches)
     
-    def create_faiss_index(self, vectors):
-        """Create FAISS index for vector search"""
-        dimension = vectors.shape[1]
-        index = faiss.IndexFlatL2(dimension)
-        index.add(vectors)
-        return index
+    def create_vector_store(self, vectors):
+        """Create the vector index for search"""
+        return VectorStore.build(vectors, self.embedding_dtype)
     
     def retrieve_top_chunks(self, query, k=5):
         """Retrieve top k relevant chunks for a query"""
-        if not self.faiss_index or not self.chunks:
+        if not self.vector_store or not self.chunks:
             return []
         
         query_vec = self.model.encode([query])
-        D, I = self.faiss_index.search(query_vec, k)
+        D, I = self.vector_store.search(query_vec, k)
         return [self.chunks[i] for i in I[0]]
     
     def process_document(self, pdf_file):
@@ -69,8 +89,11 @@ class RAGProcessor:
             if vectors.ndim != 2:
                 raise ValueError(f"Invalid embedding shape: {vectors.shape}")
             
-            # Create FAISS index
-            self.faiss_index = self.create_faiss_index(vectors)
+            # Create the vector index and persist it for later requests
+            self.vector_store = self.create_vector_store(vectors)
+            if self.storage_dir:
+                save_store(self.storage_dir, self.chunks, self.vector_store)
+                self.load()
             
             return True
             